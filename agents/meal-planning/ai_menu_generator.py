@@ -4,29 +4,32 @@ Complete AI-Powered Menu Generation System
 Integrates with Claude/OpenAI to generate custom recipes and menus
 """
 
+import itertools
 import json
 import random
 import re
+import uuid
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 from datetime import datetime, timedelta
 import asyncio
-import aiohttp
 import os
 import logging
 
-# AI Integration imports
-try:
-    import anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
-
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from ai_providers import AIProvider, ProviderRequest, ProviderResponse, create_default_providers
+from batch_jobs import AnthropicBatchBackend, BatchBackend, LocalBatchBackend, run_batch_job
+from prompt_builder import PromptBuilder
+from recipe_parser import (
+    RecipeRejected, StreamingRecipeCheck, is_salvageable, normalize_recipe, parse_json_tolerant,
+    parse_recipe_response
+)
+from recipe_cache import RecipeCache, requirements_key
+from recipe_library import RecipeLibrary
+from nutrition_engine import CALORIES, PlanNutrition
+from plan_journal import PlanJournal
+from provider_resilience import circuit_breaker_status, get_circuit_breaker, rate_limiter_status
+from provider_metrics import get_latency_histogram, latency_snapshot, record_route, route_snapshot
+from usage_accounting import Usage, metered, record_meal_usage, record_usage, usage_report, usage_snapshot
 
 # Set up logging
 logging.basicConfig(
@@ -50,26 +53,123 @@ class RecipeRequirements:
     budget_level: str  # budget, moderate, premium
     equipment_available: List[str]  # oven, stovetop, air_fryer, etc.
 
+# Model used for each latency tier, per provider
+MODEL_TIERS = {
+    "claude": {"fast": "claude-3-haiku-20240307", "large": "claude-3-sonnet-20240229"},
+    "openai": {"fast": "gpt-4o-mini", "large": "gpt-4-turbo-preview"}
+}
+
+
+def tier_model(provider_name: str, tier: str) -> str:
+    """Model for a tier; other provider keys get Claude-style prompts, so Claude's tiers"""
+    return MODEL_TIERS.get(provider_name, MODEL_TIERS["claude"])[tier]
+
+
+# Tier per (menu_type, meal_category); "*" matches anything. Light meals go
+# to the fast tier, everything else to the large one.
+DEFAULT_MODEL_ROUTES = {
+    ("*", "snack"): "fast",
+    ("*", "optional_snack"): "fast",
+    ("*", "breakfast"): "fast",
+    ("*", "break_fast"): "fast",
+    ("*", "*"): "large"
+}
+
+TIER_ORDER = ["fast", "large"]
+
+
 class AIMenuGenerator:
     """AI-powered menu and recipe generation system"""
 
-    def __init__(self, anthropic_api_key: str = None, openai_api_key: str = None):
-        self.anthropic_client = None
-        self.openai_client = None
-
-        # Initialize AI clients
-        if anthropic_api_key and ANTHROPIC_AVAILABLE:
-            self.anthropic_client = anthropic.Anthropic(api_key=anthropic_api_key)
-            logging.info("Anthropic client initialized")
+    def __init__(
+        self,
+        anthropic_api_key: str = None,
+        openai_api_key: str = None,
+        recipe_cache: RecipeCache = None,
+        routing: str = "primary",
+        providers: Dict[str, AIProvider] = None,
+        recipe_timeout: float = None,
+        model_routes: Dict[Tuple[str, str], str] = None,
+        batch_backend: BatchBackend = None,
+        recipe_library: RecipeLibrary = None,
+        library_fill_details: bool = False
+    ):
+        # Initialize async AI providers, keyed by name in preference order.
+        # Keys pick the prompt style ("claude"/"openai"); pass `providers` to
+        # plug in FakeProvider or RecordReplayProvider for offline runs.
+        if providers is not None:
+            self.providers: Dict[str, AIProvider] = dict(providers)
+        else:
+            self.providers = create_default_providers(
+                anthropic_api_key=anthropic_api_key,
+                openai_api_key=openai_api_key
+            )
 
-        if openai_api_key and OPENAI_AVAILABLE:
-            self.openai_client = openai.OpenAI(api_key=openai_api_key)
-            logging.info("OpenAI client initialized")
+        # Optional persistent cache of generated recipes
+        self.recipe_cache = recipe_cache
+
+        # Optional library of existing recipes, searched before any AI call.
+        # Library entries have no ingredients or steps, so a hit costs no AI
+        # call. Opt in with `library_fill_details` to have a short fast-tier
+        # follow-up fill just those in (once per library recipe, as the
+        # library keeps them) when a provider is ready.
+        self.recipe_library = recipe_library
+        self.library_fill_details = library_fill_details
+        self._library_fills: Dict[str, asyncio.Future] = {}
+        # Detail fill-ins for the plan being generated (reset as each plan starts)
+        self.library_stats = {"detail_requests": 0, "details_filled": 0}
+
+        # "primary" uses the first available provider; "hedged" also fires the
+        # secondary once the primary is slower than its p95 latency
+        if routing not in ("primary", "hedged"):
+            raise ValueError(f"Unknown routing mode: {routing}")
+        self.routing = routing
+        self.hedge_quantile = 0.95
+        self.hedge_min_samples = 20
+        self.hedge_default_delay = 10.0  # seconds, until enough latency samples exist
+        self.hedge_stats = {"requests": 0, "hedges_fired": 0, "secondary_wins": 0}
+
+        # With a per-recipe deadline (seconds), the template fallback is built
+        # while the AI request is in flight and returned as soon as it expires
+        self.recipe_timeout = recipe_timeout
+        self.speculation_stats = {"requests": 0, "deadline_fallbacks": 0}
+
+        # Model tier per (menu_type, meal_category); overrides merge over the defaults
+        self.model_routes = {**DEFAULT_MODEL_ROUTES, **(model_routes or {})}
+        for tier in self.model_routes.values():
+            if tier not in TIER_ORDER:
+                raise ValueError(f"Unknown model tier: {tier}")
+
+        # Output token budget for batched requests; larger batches are split
+        self.batch_tokens_per_recipe = 700
+        self.batch_max_output_tokens = 8192
+
+        # batch_mode="job" submits every recipe of a run as one offline batch
+        # job (half price, finishes within hours) and polls until it ends
+        self.batch_backend = batch_backend
+        self.batch_poll_interval = 30.0  # seconds
+        self.batch_timeout = 24 * 3600.0
+        self.batch_job_stats = {"jobs": 0, "requests": 0, "succeeded": 0, "failed": 0}
+
+        # Single recipes are streamed and checked as they arrive; a response
+        # whose calories or ingredients already break the requirements is
+        # aborted and re-requested straight away, up to `stream_retries` times
+        self.stream_validation = True
+        self.stream_retries = 2
+        self.calorie_abort_margin = 100
+        self.stream_stats = {"aborted": 0, "retries": 0}
+
+        # Incomplete responses get a short follow-up for just the missing fields
+        self.missing_field_tokens = 400
+        self.repair_stats = {"field_requests": 0, "recipes_salvaged": 0}
 
         # Load cuisine knowledge base
         self.cuisine_knowledge = self._load_cuisine_knowledge()
         self.nutrition_database = self._load_nutrition_database()
 
+        # Static prompt prefixes are rendered once here and reused by every request
+        self.prompt_builder = PromptBuilder(self.cuisine_knowledge)
+
     def _load_cuisine_knowledge(self) -> Dict[str, Dict]:
         """Load cuisine-specific knowledge for better AI prompts"""
         return {
@@ -160,91 +260,149 @@ class AIMenuGenerator:
             }
         }
 
-    async def generate_recipe(self, requirements: RecipeRequirements) -> Dict:
-        """Generate a single recipe using AI"""
+    async def generate_recipe(self, requirements: RecipeRequirements, timeout: float = None) -> Dict:
+        """Generate a single recipe using AI, reusing cached variants when available
+
+        `timeout` (seconds) caps this call on top of `recipe_timeout`; past
+        it the template recipe is returned instead.
+        """
+
+        from_library = await self._library_recipe(requirements)
+        if from_library is not None:
+            return from_library
+
+        if self.recipe_cache:
+            cached = self.recipe_cache.get(requirements)
+            if cached is not None:
+                return cached
 
-        # Choose AI provider based on availability and task
-        if self.anthropic_client:
+        deadlines = [limit for limit in (self.recipe_timeout, timeout) if limit is not None]
+        with metered() as usage:
+            if deadlines and self.providers:
+                recipe = await self._generate_recipe_speculative(requirements, min(deadlines))
+            else:
+                recipe = await self._dispatch_recipe(requirements)
+        self._attach_usage(recipe, requirements, usage)
+
+        # Only paid AI output is worth keeping
+        if self.recipe_cache and recipe.get("generated_by") != "template":
+            self.recipe_cache.put(requirements, recipe)
+
+        return recipe
+
+    async def _library_recipe(self, req: RecipeRequirements) -> Optional[Dict]:
+        """A library recipe within tolerance of the requirements, or None to generate one"""
+
+        match = self.recipe_library.find(req) if self.recipe_library else None
+        if match is None:
+            return None
+
+        recipe = self.recipe_library.recipe_dict(match)
+        recipe["id"] = f"{req.menu_type}_{req.meal_category}_{match.library_id[:8]}"
+        recipe["cuisine"] = match.cuisine or req.cuisine_style
+        recipe["category"] = req.meal_category
+        recipe["generated_by"] = "library"
+        recipe["library_hit"] = True
+
+        missing = [key for key in ("ingredients", "instructions") if not recipe.get(key)]
+        ready = self._ready_providers() if missing and self.library_fill_details else []
+        if ready:
+            # Slots sharing a library recipe wait on one fill-in instead of each asking
+            fill = self._library_fills.get(match.library_id)
+            if fill is None:
+                fill = asyncio.ensure_future(self._fill_library_details(ready[0], req, recipe, missing, match))
+                self._library_fills[match.library_id] = fill
+                fill.add_done_callback(lambda _: self._library_fills.pop(match.library_id, None))
+                recipe = await fill
+            else:
+                filled = await asyncio.shield(fill)
+                recipe.update({key: filled[key] for key in missing if filled.get(key)})
+
+        recipe.setdefault("ingredients", [])
+        recipe.setdefault("instructions", [])
+        logging.info(f"Using library recipe: {match.name}")
+        return recipe
+
+    async def _fill_library_details(self, provider_name: str, req: RecipeRequirements, recipe: Dict,
+                                    missing: List[str], match) -> Dict:
+        """Fill in the missing fields of a library recipe and keep them in the library"""
+
+        # Filling in a known dish is easy work, so it always goes to the fast tier
+        with metered() as usage:
+            try:
+                self.library_stats["detail_requests"] += 1
+                recipe = await self._complete_missing_fields(
+                    provider_name, tier_model(provider_name, "fast"), req, recipe, missing, repair=False
+                )
+                self.recipe_library.add_details(match.library_id, recipe["ingredients"], recipe["instructions"])
+                self.library_stats["details_filled"] += 1
+            except Exception as e:
+                logging.warning(f"Could not fill in details for library recipe {match.name}: {str(e)}")
+        self._attach_usage(recipe, req, usage)
+        return recipe
+
+    @staticmethod
+    def _new_recipe_id(req: RecipeRequirements) -> str:
+        """Id for a new recipe, unique even for recipes finished in the same second"""
+        return f"{req.menu_type}_{req.meal_category}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    def _attach_usage(self, recipe: Dict, req: RecipeRequirements, usage: Usage):
+        """Record the AI usage spent on a recipe in it and in the process-wide totals"""
+        if usage.calls:
+            recipe["usage"] = usage.as_dict()
+            record_meal_usage(req.menu_type, req.meal_category, usage)
+
+    async def _dispatch_recipe(self, requirements: RecipeRequirements) -> Dict:
+        """Generate a recipe with the configured provider routing"""
+
+        # Choose AI provider based on availability and task; providers with
+        # an open circuit are skipped without waiting on a doomed call
+        ready = self._ready_providers()
+        if self.routing == "hedged" and len(ready) > 1:
+            return await self._generate_recipe_hedged(requirements, ready[:2])
+        elif "claude" in ready:
             return await self._generate_recipe_claude(requirements)
-        elif self.openai_client:
+        elif "openai" in ready:
             return await self._generate_recipe_openai(requirements)
         else:
             # Fallback to template-based generation
             return self._generate_recipe_template(requirements)
 
-    async def _generate_recipe_claude(self, req: RecipeRequirements) -> Dict:
-        """Generate recipe using Claude (Anthropic)"""
+    def _ready_providers(self) -> List[str]:
+        """Configured providers, in preference order, whose circuit is not open"""
+        return [
+            name for name, provider in self.providers.items()
+            if not get_circuit_breaker(provider.name).is_open()
+        ]
 
-        cuisine_info = self.cuisine_knowledge.get(req.menu_type, {})
-
-        prompt = f"""
-        Create a detailed {req.cuisine_style} {req.meal_category} recipe that follows these exact requirements:
-
-        MENU TYPE: {req.menu_type}
-        TARGET CALORIES: {req.target_calories} calories (±20 calories)
-        TARGET PROTEIN: {req.target_protein}g protein minimum
-        PREP TIME: Maximum {req.prep_time_max} minutes
-        DIFFICULTY: {req.difficulty_level}
-        SERVES: {req.family_size} people
-        SEASON: {req.season} (use seasonal ingredients)
-        BUDGET: {req.budget_level}
-
-        DIETARY RESTRICTIONS: {', '.join(req.dietary_restrictions) if req.dietary_restrictions else 'None'}
-        AVAILABLE EQUIPMENT: {', '.join(req.equipment_available)}
-
-        CUISINE GUIDELINES:
-        {json.dumps(cuisine_info, indent=2)}
-
-        REQUIREMENTS:
-        1. Recipe must be authentic to the {req.cuisine_style} style
-        2. Use seasonal {req.season} ingredients when possible
-        3. Meet the exact calorie and protein targets
-        4. Include prep and cook times
-        5. List all ingredients with exact measurements
-        6. Provide clear step-by-step instructions
-
-        Format the response as JSON with this structure:
-        {{
-            "name": "Recipe Name",
-            "description": "Brief description",
-            "prep_time": "X minutes",
-            "cook_time": "Y minutes",
-            "servings": {req.family_size},
-            "calories_per_serving": number,
-            "protein_per_serving": "Xg",
-            "ingredients": [
-                {{"item": "ingredient", "amount": "X", "unit": "cups/tbsp/etc"}},
-                ...
-            ],
-            "instructions": [
-                "Step 1...",
-                "Step 2...",
-                ...
-            ],
-            "tips": ["Optional cooking tips"],
-            "tags": ["tag1", "tag2"]
-        }}
-        """
+    async def _generate_recipe_speculative(self, req: RecipeRequirements, timeout: float) -> Dict:
+        """AI recipe bounded by `timeout` seconds, with the template ready in advance"""
+
+        self.speculation_stats["requests"] += 1
+
+        # Start the AI request first, then build the fallback while it is in flight:
+        # yielding once lets the task run up to its first await (the request send)
+        ai_task = asyncio.ensure_future(self._dispatch_recipe(req))
+        await asyncio.sleep(0)
+        template = self._build_recipe_template(req)
 
         try:
-            message = self.anthropic_client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=2000,
-                messages=[{"role": "user", "content": prompt}]
+            # wait_for cancels the AI request when the deadline passes
+            return await asyncio.wait_for(ai_task, timeout)
+        except asyncio.TimeoutError:
+            self.speculation_stats["deadline_fallbacks"] += 1
+            logging.warning(
+                f"{req.meal_category} recipe missed its {timeout:.1f}s deadline - using template"
             )
+            # Marked so callers don't spend another full deadline retrying it
+            template["deadline_fallback"] = True
+            return template
 
-            # Parse the JSON response
-            recipe_json = json.loads(message.content[0].text)
-
-            # Add metadata
-            recipe_json["id"] = f"{req.menu_type}_{req.meal_category}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            recipe_json["cuisine"] = req.cuisine_style
-            recipe_json["category"] = req.meal_category
-            recipe_json["generated_by"] = "claude"
-            recipe_json["generated_at"] = datetime.now().isoformat()
+    async def _generate_recipe_claude(self, req: RecipeRequirements) -> Dict:
+        """Generate recipe using Claude (Anthropic)"""
 
-            logging.info(f"Generated recipe: {recipe_json['name']} using Claude")
-            return recipe_json
+        try:
+            return await self._request_recipe("claude", req)
 
         except Exception as e:
             logging.error(f"Error generating recipe with Claude: {str(e)}")
@@ -253,48 +411,332 @@ class AIMenuGenerator:
     async def _generate_recipe_openai(self, req: RecipeRequirements) -> Dict:
         """Generate recipe using OpenAI GPT"""
 
-        cuisine_info = self.cuisine_knowledge.get(req.menu_type, {})
+        try:
+            return await self._request_recipe("openai", req)
+
+        except Exception as e:
+            logging.error(f"Error generating recipe with OpenAI: {str(e)}")
+            return self._generate_recipe_template(req)
 
-        prompt = f"""
-        Generate a {req.cuisine_style} {req.meal_category} recipe with these specifications:
-        - Calories: {req.target_calories} (±20)
-        - Protein: {req.target_protein}g minimum
-        - Prep time: max {req.prep_time_max} minutes
-        - Serves: {req.family_size}
-        - Season: {req.season}
-        - Budget: {req.budget_level}
-        - Dietary restrictions: {req.dietary_restrictions}
+    async def _generate_recipe_hedged(self, req: RecipeRequirements, providers: List[str] = None) -> Dict:
+        """Race the primary provider against a delayed hedge on the secondary
 
-        Return as JSON with name, ingredients, instructions, and nutrition info.
+        The hedge fires once the primary has been running longer than its p95
+        latency (or right away if the primary fails). The first valid recipe
+        wins and the other request is cancelled.
         """
 
+        primary, secondary = (providers or list(self.providers))[:2]
+        self.hedge_stats["requests"] += 1
+
+        primary_task = asyncio.ensure_future(self._request_recipe(primary, req))
+        pending = {primary_task}
+
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You are an expert chef specializing in healthy, customized meal planning."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
+            done, pending = await asyncio.wait(pending, timeout=self._hedge_delay(primary))
+
+            if primary_task in done:
+                if primary_task.exception() is None:
+                    return primary_task.result()
+                logging.warning(f"{primary} failed ({primary_task.exception()}) - trying {secondary}")
+
+            self.hedge_stats["hedges_fired"] += 1
+            secondary_task = asyncio.ensure_future(self._request_recipe(secondary, req))
+            pending.add(secondary_task)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary_task:
+                            self.hedge_stats["secondary_wins"] += 1
+                        return task.result()
+                    logging.error(f"Hedged recipe request failed: {task.exception()}")
+        finally:
+            # Cancel the loser (or anything left if we're cancelled ourselves)
+            for task in pending:
+                task.cancel()
+
+        return self._generate_recipe_template(req)
+
+    def _hedge_delay(self, provider_name: str) -> float:
+        """Seconds to wait on a provider before hedging, from its latency histogram"""
+        # Latencies are recorded under the provider's own name, not its key here
+        histogram = get_latency_histogram(self.providers[provider_name].name)
+        if histogram.total < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return histogram.percentile(self.hedge_quantile)
+
+    def _recipe_request(self, provider_name: str, req: RecipeRequirements) -> ProviderRequest:
+        """Single-recipe request in the provider's prompt style, on the routed model tier"""
+        tier = self._route_tier(req.menu_type, req.meal_category)
+        system = self.prompt_builder.provider_prefix(provider_name, req.menu_type)
+        return ProviderRequest(
+            prompt=self.prompt_builder.recipe_suffix(req),
+            model=tier_model(provider_name, tier),
+            max_tokens=2000,
+            system=system,
+            json_mode=provider_name == "openai",
+            cache_system=self.prompt_builder.cacheable(system),
+            requirements=[req]
+        )
+
+    async def _request_recipe(self, provider_name: str, req: RecipeRequirements) -> Dict:
+        """Request one recipe from a provider; raises if the call or response is unusable"""
+
+        request = self._recipe_request(provider_name, req)
+        if not self.stream_validation:
+            response = await self.providers[provider_name].complete(request)
+        else:
+            attempt = 0
+            while True:
+                try:
+                    response = await self.providers[provider_name].complete(
+                        request, check=StreamingRecipeCheck(req, self.calorie_abort_margin)
+                    )
+                    break
+                except RecipeRejected as e:
+                    self.stream_stats["aborted"] += 1
+                    if attempt >= self.stream_retries:
+                        raise
+                    attempt += 1
+                    self.stream_stats["retries"] += 1
+                    logging.warning(f"Aborted {provider_name} {req.meal_category} stream ({str(e)}) - retrying")
+                    # Tell the model what went wrong so the retry doesn't repeat it
+                    request = replace(
+                        request,
+                        prompt=f"{self.prompt_builder.recipe_suffix(req)}\nA previous attempt was rejected: {str(e)}."
+                    )
+        self._record_route(req.menu_type, req.meal_category, response)
+
+        recipe_json = await self._recipe_from_response(provider_name, req, response)
+        logging.info(f"Generated recipe: {recipe_json['name']} using {provider_name}")
+        return recipe_json
+
+    async def _recipe_from_response(self, provider_name: str, req: RecipeRequirements, response: ProviderResponse) -> Dict:
+        """Parse a single-recipe response, filling gaps where possible, and add metadata"""
+
+        # Parse the JSON response, repairing it and filling gaps where possible
+        recipe_json, missing = parse_recipe_response(response.text)
+        if missing:
+            recipe_json = await self._complete_missing_fields(provider_name, response.model, req, recipe_json, missing)
+
+        # Add metadata
+        recipe_json["id"] = self._new_recipe_id(req)
+        recipe_json["cuisine"] = req.cuisine_style
+        recipe_json["category"] = req.meal_category
+        recipe_json["generated_by"] = provider_name
+        recipe_json["generated_at"] = datetime.now().isoformat()
+        return recipe_json
+
+    def _route_tier(self, menu_type: str, meal_category: str) -> str:
+        """Model tier for a meal: most specific route wins"""
+        for key in ((menu_type, meal_category), ("*", meal_category), (menu_type, "*"), ("*", "*")):
+            if key in self.model_routes:
+                return self.model_routes[key]
+        return "large"
+
+    def _record_route(self, menu_type: str, meal_category: str, response):
+        record_route(
+            f"{menu_type}/{meal_category} -> {response.model}",
+            response.latency, response.input_tokens, response.output_tokens
+        )
+
+    async def _complete_missing_fields(
+        self,
+        provider_name: str,
+        model: str,
+        req: RecipeRequirements,
+        recipe: Dict,
+        missing: List[str],
+        repair: bool = True
+    ) -> Dict:
+        """Re-request only the fields a response left out and merge them in
 
-            recipe_json = json.loads(response.choices[0].message.content)
+        Raises ValueError when too little of the recipe survived to be worth
+        completing, or the follow-up still leaves required fields missing.
+        Repairs of AI responses are counted in `repair_stats`; other callers
+        (library detail fill-ins) keep their own counts.
+        """
+        if not is_salvageable(missing):
+            raise ValueError(f"{provider_name} returned an unusable recipe (missing {', '.join(missing)})")
+        if provider_name not in self.providers:
+            raise ValueError(f"No interactive {provider_name} provider to complete {', '.join(missing)}")
+
+        if repair:
+            self.repair_stats["field_requests"] += 1
+        system = self.prompt_builder.provider_prefix(provider_name, req.menu_type)
+        response = await self.providers[provider_name].complete(ProviderRequest(
+            prompt=self.prompt_builder.missing_fields_suffix(req, recipe, missing),
+            model=model,
+            max_tokens=min(2000, self.missing_field_tokens * len(missing)),
+            system=system,
+            json_mode=provider_name == "openai",
+            cache_system=self.prompt_builder.cacheable(system),
+            requirements=[req]
+        ))
+
+        patch, _ = normalize_recipe(parse_json_tolerant(response.text))
+        recipe.update({field: patch[field] for field in missing if field in patch})
+
+        still_missing = [field for field in missing if field not in recipe]
+        if still_missing:
+            raise ValueError(f"{provider_name} left recipe fields missing: {', '.join(still_missing)}")
+
+        if repair:
+            self.repair_stats["recipes_salvaged"] += 1
+        logging.info(f"Completed {len(missing)} missing field(s) for {recipe['name']} via {provider_name}")
+        return recipe
 
-            # Add metadata
-            recipe_json["id"] = f"{req.menu_type}_{req.meal_category}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            recipe_json["generated_by"] = "openai"
-            recipe_json["generated_at"] = datetime.now().isoformat()
+    async def generate_recipes_batch(self, requirements_list: List[RecipeRequirements]) -> List[Dict]:
+        """Generate several recipes with one structured AI request per chunk
 
-            logging.info(f"Generated recipe: {recipe_json['name']} using OpenAI")
-            return recipe_json
+        Results come back in the same order as `requirements_list`. Items the
+        provider leaves out or returns malformed fall back to
+        `_generate_recipe_template` individually.
+        """
 
+        recipes: List[Optional[Dict]] = [None] * len(requirements_list)
+
+        # Serve what we can from the library and the cache first; library
+        # detail fill-ins (if enabled) run concurrently
+        library_hits = await asyncio.gather(*(self._library_recipe(req) for req in requirements_list))
+        pending = []
+        for index, (requirements, found) in enumerate(zip(requirements_list, library_hits)):
+            if found is None and self.recipe_cache:
+                found = self.recipe_cache.get(requirements)
+            if found is not None:
+                recipes[index] = found
+            else:
+                pending.append(index)
+
+        # Split so each chunk's expected output fits in one response
+        chunk_size = max(1, self.batch_max_output_tokens // self.batch_tokens_per_recipe)
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            with metered() as usage:
+                generated = await self._generate_batch_chunk([requirements_list[i] for i in chunk])
+
+            # One call served the whole chunk, so each recipe carries an even share
+            share = usage.share(len(chunk))
+            for index, recipe in zip(chunk, generated):
+                self._attach_usage(recipe, requirements_list[index], share)
+
+            for index, recipe in zip(chunk, generated):
+                recipes[index] = recipe
+                if self.recipe_cache and recipe.get("generated_by") != "template":
+                    self.recipe_cache.put(requirements_list[index], recipe)
+
+        return recipes
+
+    async def _generate_batch_chunk(self, requirements_list: List[RecipeRequirements]) -> List[Dict]:
+        """Request one chunk of recipes in a single call and split the response"""
+
+        ready = self._ready_providers()
+        if "claude" in ready:
+            provider_name = "claude"
+        elif "openai" in ready:
+            provider_name = "openai"
+        else:
+            return [self._generate_recipe_template(req) for req in requirements_list]
+
+        # One call serves every item, so it needs the largest tier any item routes to
+        tier = max(
+            (self._route_tier(req.menu_type, req.meal_category) for req in requirements_list),
+            key=TIER_ORDER.index
+        )
+        model = tier_model(provider_name, tier)
+        system = self.prompt_builder.provider_prefix(provider_name, *(req.menu_type for req in requirements_list))
+
+        # Identical requirements only need stating once, with a variant count
+        variants = len(requirements_list) > 1 and all(req == requirements_list[0] for req in requirements_list)
+        if variants:
+            prompt = self.prompt_builder.variants_suffix(requirements_list[0], len(requirements_list))
+            route = f"{requirements_list[0].meal_category} variants[{len(requirements_list)}]"
+        else:
+            prompt = self.prompt_builder.batch_suffix(requirements_list)
+            route = f"batch[{len(requirements_list)}]"
+
+        try:
+            response = await self.providers[provider_name].complete(ProviderRequest(
+                prompt=prompt,
+                model=model,
+                max_tokens=min(
+                    self.batch_max_output_tokens,
+                    self.batch_tokens_per_recipe * len(requirements_list)
+                ),
+                system=system,
+                json_mode=provider_name == "openai",
+                cache_system=self.prompt_builder.cacheable(system),
+                requirements=list(requirements_list)
+            ))
+            self._record_route(requirements_list[0].menu_type, route, response)
+            items = self._split_batch_response(response.text, len(requirements_list))
         except Exception as e:
-            logging.error(f"Error generating recipe with OpenAI: {str(e)}")
-            return self._generate_recipe_template(req)
+            logging.error(f"Error generating recipe batch with {provider_name}: {str(e)}")
+            return [self._generate_recipe_template(req) for req in requirements_list]
+
+        async def finish_item(slot: int, req: RecipeRequirements, item: Optional[Dict]) -> Dict:
+            recipe, missing = normalize_recipe(item)
+            if missing:
+                try:
+                    recipe = await self._complete_missing_fields(provider_name, model, req, recipe, missing)
+                except Exception as e:
+                    logging.warning(f"Batch item {slot} ({req.meal_category}) incomplete ({str(e)}) - using template")
+                    return self._generate_recipe_template(req)
+
+            recipe.pop("slot", None)
+            recipe["id"] = self._new_recipe_id(req)
+            recipe["cuisine"] = req.cuisine_style
+            recipe["category"] = req.meal_category
+            recipe["generated_by"] = provider_name
+            recipe["generated_at"] = datetime.now().isoformat()
+            return recipe
+
+        recipes = list(await asyncio.gather(*(
+            finish_item(slot, req, item)
+            for slot, (req, item) in enumerate(zip(requirements_list, items), start=1)
+        )))
+
+        logging.info(f"Generated {len(recipes)} recipes in one {provider_name} batch request")
+        return recipes
+
+    def _split_batch_response(self, text: str, expected: int) -> List[Optional[Dict]]:
+        """Split a batched JSON response into per-slot items (None where missing)"""
+
+        data = parse_json_tolerant(text)
+        items = data.get("recipes", []) if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise ValueError("Batch response has no recipes list")
+
+        by_slot: List[Optional[Dict]] = [None] * expected
+        unslotted = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            slot = item.get("slot")
+            if isinstance(slot, int) and 1 <= slot <= expected and by_slot[slot - 1] is None:
+                by_slot[slot - 1] = item
+            else:
+                unslotted.append(item)
+
+        # Items without a usable slot number fill remaining gaps in order
+        for index in range(expected):
+            if by_slot[index] is None and unslotted:
+                by_slot[index] = unslotted.pop(0)
+
+        return by_slot
 
     def _generate_recipe_template(self, req: RecipeRequirements) -> Dict:
         """Fallback template-based recipe generation when AI is not available"""
 
+        recipe = self._build_recipe_template(req)
+        logging.info(f"Generated template recipe: {recipe['name']}")
+        return recipe
+
+    def _build_recipe_template(self, req: RecipeRequirements) -> Dict:
+        """Template recipe for the requirements; cheap and free of I/O"""
+
         # Create a basic recipe based on requirements
         recipe_templates = {
             "mediterranean": {
@@ -365,7 +807,7 @@ class AIMenuGenerator:
 
         # Build the complete recipe
         recipe = {
-            "id": f"{req.menu_type}_{req.meal_category}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            "id": self._new_recipe_id(req),
             "name": template["name"],
             "category": req.meal_category,
             "cuisine": req.cuisine_style,
@@ -386,7 +828,6 @@ class AIMenuGenerator:
             "generated_at": datetime.now().isoformat()
         }
 
-        logging.info(f"Generated template recipe: {recipe['name']}")
         return recipe
 
     async def generate_monthly_menu(
@@ -396,11 +837,85 @@ class AIMenuGenerator:
         year: int,
         dietary_restrictions: List[str] = None,
         family_size: int = 2,
-        budget_level: str = "moderate"
+        budget_level: str = "moderate",
+        batch_mode: str = None,
+        journal_path: str = None
     ) -> Dict:
-        """Generate a complete monthly menu with AI-powered recipes"""
+        """Generate a complete monthly menu with AI-powered recipes
+
+        batch_mode: None for one request per recipe, "day" for one request
+        per day's meals, "week" for one request per week, "variants" for one
+        request per unique set of requirements (asking for one distinct
+        variant per meal that shares them), or "job" to submit the whole
+        month as one offline job to `batch_backend`.
+        journal_path: checkpoint every finished recipe to this journal; an
+        existing journal is resumed and only its missing meals are generated.
+        """
+
+        plan = self._start_monthly_plan(
+            menu_type, month, year, dietary_restrictions, family_size, budget_level, batch_mode, journal_path
+        )
+
+        if batch_mode == "job":
+            await self._generate_plans_as_job([plan])
+        elif batch_mode == "variants":
+            await self._generate_plan_variants(plan)
+        else:
+            for week in plan["slots"]:
+                await self._generate_plan_week(plan, week, batch_mode)
+
+                # Add progress logging
+                logging.info(f"Completed week {week} of {menu_type} menu")
+
+        return self._finish_monthly_plan(plan)
+
+    async def generate_monthly_menus(self, plans: List[Dict]) -> List[Dict]:
+        """Generate several monthly menus through a single offline batch job
+
+        Each entry holds generate_monthly_menu arguments (menu_type, month,
+        year, ...). Every pending recipe of every plan is submitted to
+        `batch_backend` at once, e.g. to pre-generate next month's plans
+        overnight at batch pricing. Library detail counts in each summary
+        cover the whole job.
+        """
+
+        started = [
+            self._start_monthly_plan(**{**params, "batch_mode": "job"})
+            for params in plans
+        ]
+        await self._generate_plans_as_job(started)
+        return [self._finish_monthly_plan(plan) for plan in started]
+
+    def _start_monthly_plan(
+        self,
+        menu_type: str,
+        month: int,
+        year: int,
+        dietary_restrictions: List[str] = None,
+        family_size: int = 2,
+        budget_level: str = "moderate",
+        batch_mode: str = None,
+        journal_path: str = None
+    ) -> Dict:
+        """Every meal slot's requirements for a month, with journaled recipes filled in"""
+
+        if batch_mode not in (None, "day", "week", "variants", "job"):
+            raise ValueError(f"Unknown batch_mode: {batch_mode}")
+        if batch_mode == "job" and self.batch_backend is None:
+            raise ValueError("batch_mode 'job' needs a batch_backend")
+
+        journal = PlanJournal(journal_path, {
+            "menu_type": menu_type,
+            "month": month,
+            "year": year,
+            "dietary_restrictions": dietary_restrictions or [],
+            "family_size": family_size,
+            "budget_level": budget_level,
+            "batch_mode": batch_mode
+        }) if journal_path else None
 
         logging.info(f"Generating {menu_type} menu for {month}/{year}")
+        self.library_stats = {"detail_requests": 0, "details_filled": 0}
 
         monthly_menu = {
             "meta": {
@@ -410,6 +925,7 @@ class AIMenuGenerator:
                 "family_size": family_size,
                 "budget_level": budget_level,
                 "dietary_restrictions": dietary_restrictions or [],
+                "batch_mode": batch_mode,
                 "generated_at": datetime.now().isoformat()
             },
             "weeks": {}
@@ -424,22 +940,15 @@ class AIMenuGenerator:
         }
         season = seasons[month]
 
-        # Generate 4 weeks of menus
-        for week in range(1, 5):
-            weekly_menu = {
-                "week_number": week,
-                "days": {}
-            }
+        # Same meal categories every day
+        meal_categories = self._get_meal_categories(menu_type)
 
+        # Build every meal's requirements for 4 weeks of menus up front
+        slots: Dict[int, List[Tuple]] = {}
+        recipes: Dict[int, List[Optional[Dict]]] = {}
+        for week in range(1, 5):
+            week_slots = []
             for day in range(1, 8):  # 7 days
-                daily_menu = {
-                    "date": f"{year}-{month:02d}-{(week-1)*7 + day:02d}",
-                    "meals": {}
-                }
-
-                # Generate meals for the day
-                meal_categories = self._get_meal_categories(menu_type)
-
                 for meal_category in meal_categories:
                     requirements = RecipeRequirements(
                         menu_type=menu_type,
@@ -455,17 +964,187 @@ class AIMenuGenerator:
                         budget_level=budget_level,
                         equipment_available=["oven", "stovetop", "microwave"]
                     )
+                    week_slots.append((day, meal_category, requirements))
+            slots[week] = week_slots
+
+            # Reuse journaled recipes; only the rest need generating
+            recipes[week] = [
+                journal.meal(f"week_{week}/day_{day}/{meal_category}") if journal else None
+                for day, meal_category, _ in week_slots
+            ]
+
+        return {"menu": monthly_menu, "journal": journal, "slots": slots, "recipes": recipes}
+
+    async def _generate_plan_week(self, plan: Dict, week: int, batch_mode: Optional[str]):
+        """Generate a week's pending recipes interactively"""
+
+        week_slots = plan["slots"][week]
+        week_recipes = plan["recipes"][week]
+        journal = plan["journal"]
+        pending = [index for index, recipe in enumerate(week_recipes) if recipe is None]
+
+        async def generate_slots(indexes: List[int]):
+            if batch_mode is None:
+                recipes = []
+                for index in indexes:
+                    recipes.append(await self.generate_recipe(week_slots[index][2]))
+                    self._checkpoint_slot(journal, week, week_slots[index], recipes[-1])
+            else:
+                recipes = await self.generate_recipes_batch([week_slots[index][2] for index in indexes])
+                for index, recipe in zip(indexes, recipes):
+                    self._checkpoint_slot(journal, week, week_slots[index], recipe)
+
+            for index, recipe in zip(indexes, recipes):
+                week_recipes[index] = recipe
+
+        # Generate recipes
+        if batch_mode == "day":
+            for day in range(1, 8):
+                day_pending = [index for index in pending if week_slots[index][0] == day]
+                if day_pending:
+                    await generate_slots(day_pending)
+        elif pending:
+            await generate_slots(pending)
+
+    async def _generate_plan_variants(self, plan: Dict):
+        """Generate pending recipes with one request per unique set of requirements
+
+        Within a week, weekdays (and weekend days) ask for identical meals, so
+        each group of identical slots gets distinct variants from a single
+        call, assigned across the days in order.
+        """
+
+        groups: Dict[str, List[Tuple[int, int]]] = {}
+        for week, week_slots in plan["slots"].items():
+            for index, (_, _, req) in enumerate(week_slots):
+                if plan["recipes"][week][index] is None:
+                    groups.setdefault(requirements_key(req), []).append((week, index))
+
+        async def generate_group(members: List[Tuple[int, int]]):
+            week, index = members[0]
+            variants = await self.generate_recipe_variants(plan["slots"][week][index][2], len(members))
+            for (week, index), recipe in zip(members, variants):
+                plan["recipes"][week][index] = recipe
+                self._checkpoint_slot(plan["journal"], week, plan["slots"][week][index], recipe)
+
+        await asyncio.gather(*(generate_group(members) for members in groups.values()))
+        logging.info(
+            f"Generated {sum(len(members) for members in groups.values())} "
+            f"{plan['menu']['meta']['menu_type']} recipes from {len(groups)} unique requirements"
+        )
+
+    async def generate_recipe_variants(self, requirements: RecipeRequirements, count: int) -> List[Dict]:
+        """Generate `count` distinct recipes for the same requirements
+
+        Variants are requested together (split into chunks like any batch),
+        so one call covers every meal sharing the requirements.
+        """
+        return await self.generate_recipes_batch([requirements] * count)
+
+    async def _generate_plans_as_job(self, plans: List[Dict]):
+        """Generate every pending recipe of `plans` through one batch job"""
+
+        backend = self.batch_backend
+        provider_name = backend.provider_name
+        requests: Dict[str, ProviderRequest] = {}
+        targets: Dict[str, Tuple[Dict, int, int]] = {}
+
+        open_slots = [
+            (plan_index, plan, week, index, slot)
+            for plan_index, plan in enumerate(plans)
+            for week, week_slots in plan["slots"].items()
+            for index, slot in enumerate(week_slots)
+            if plan["recipes"][week][index] is None
+        ]
+        # Library lookups (and any detail fill-ins) for every open slot at once
+        library_hits = await asyncio.gather(*(self._library_recipe(slot[2]) for *_, slot in open_slots))
+
+        for (plan_index, plan, week, index, slot), found in zip(open_slots, library_hits):
+            day, meal_category, req = slot
+            if found is None and self.recipe_cache:
+                found = self.recipe_cache.get(req)
+            if found is not None:
+                plan["recipes"][week][index] = found
+                self._checkpoint_slot(plan["journal"], week, slot, found)
+                continue
+
+            custom_id = f"plan{plan_index}-w{week}-d{day}-{meal_category}"
+            requests[custom_id] = self._recipe_request(provider_name, req)
+            targets[custom_id] = (plan, week, index)
+
+        if not requests:
+            return
+
+        self.batch_job_stats["jobs"] += 1
+        self.batch_job_stats["requests"] += len(requests)
+        try:
+            responses = await run_batch_job(backend, requests, self.batch_poll_interval, self.batch_timeout)
+        except Exception as e:
+            logging.error(f"Batch job with {backend.name} failed: {str(e)} - using templates")
+            responses = {}
+
+        async def finish(custom_id: str):
+            plan, week, index = targets[custom_id]
+            slot = plan["slots"][week][index]
+            req = slot[2]
+            response = responses.get(custom_id)
+
+            recipe = None
+            with metered() as usage:
+                if response is not None:
+                    record_usage(response, batch=True)
+                    self._record_route(req.menu_type, f"{req.meal_category} (batch)", response)
+                    try:
+                        recipe = await self._recipe_from_response(provider_name, req, response)
+                    except Exception as e:
+                        logging.warning(f"Batch result {custom_id} unusable ({str(e)}) - using template")
+
+            if recipe is None:
+                self.batch_job_stats["failed"] += 1
+                recipe = self._generate_recipe_template(req)
+            else:
+                self.batch_job_stats["succeeded"] += 1
+                if self.recipe_cache:
+                    self.recipe_cache.put(req, recipe)
+            self._attach_usage(recipe, req, usage)
+
+            plan["recipes"][week][index] = recipe
+            self._checkpoint_slot(plan["journal"], week, slot, recipe)
+
+        await asyncio.gather(*(finish(custom_id) for custom_id in requests))
+
+    def _finish_monthly_plan(self, plan: Dict) -> Dict:
+        """Lay a plan's recipes out by week and day, then add lists, guides and summary"""
+
+        monthly_menu = plan["menu"]
+        menu_type = monthly_menu["meta"]["menu_type"]
+        month = monthly_menu["meta"]["month"]
+        year = monthly_menu["meta"]["year"]
 
-                    # Generate recipe
-                    recipe = await self.generate_recipe(requirements)
-                    daily_menu["meals"][meal_category] = recipe
+        for week, week_slots in plan["slots"].items():
+            weekly_menu = {
+                "week_number": week,
+                "days": {}
+            }
 
-                weekly_menu["days"][f"day_{day}"] = daily_menu
+            for (day, meal_category, _), recipe in zip(week_slots, plan["recipes"][week]):
+                day_key = f"day_{day}"
+                if day_key not in weekly_menu["days"]:
+                    weekly_menu["days"][day_key] = {
+                        "date": f"{year}-{month:02d}-{(week-1)*7 + day:02d}",
+                        "meals": {}
+                    }
+                weekly_menu["days"][day_key]["meals"][meal_category] = recipe
 
             monthly_menu["weeks"][f"week_{week}"] = weekly_menu
 
-            # Add progress logging
-            logging.info(f"Completed week {week} of {menu_type} menu")
+        # Tokens, latency and cost of the AI calls behind this plan
+        monthly_menu["meta"]["usage"] = usage_report(
+            (week_key, f"{week_key}/{day_key}", meal_category, recipe.get("usage"))
+            for week_key, week_data in monthly_menu["weeks"].items()
+            for day_key, day_data in week_data["days"].items()
+            for meal_category, recipe in day_data["meals"].items()
+        )
 
         # Generate shopping lists
         monthly_menu["shopping_lists"] = self._generate_shopping_lists(monthly_menu)
@@ -476,9 +1155,24 @@ class AIMenuGenerator:
         # Calculate summary statistics
         monthly_menu["summary"] = self._calculate_menu_summary(monthly_menu)
 
+        journal = plan["journal"]
+        if journal and not journal.completed:
+            journal.mark_complete()
+
         logging.info(f"Successfully generated complete {menu_type} menu for {month}/{year}")
         return monthly_menu
 
+    async def resume_monthly_menu(self, journal_path: str) -> Dict:
+        """Finish a monthly menu from its journal, generating only the missing meals"""
+        journal = PlanJournal(journal_path)
+        return await self.generate_monthly_menu(**journal.params, journal_path=journal_path)
+
+    def _checkpoint_slot(self, journal: Optional[PlanJournal], week: int, slot: Tuple, recipe: Dict):
+        # Only paid recipes are checkpointed; templates are retried on resume
+        if journal and recipe.get("generated_by") != "template":
+            day, meal_category, _ = slot
+            journal.record_meal(f"week_{week}/day_{day}/{meal_category}", recipe)
+
     def _get_meal_categories(self, menu_type: str) -> List[str]:
         """Get meal categories based on menu type"""
         if menu_type == "intermittent_fasting":
@@ -636,82 +1330,225 @@ class AIMenuGenerator:
     def _calculate_menu_summary(self, monthly_menu: Dict) -> Dict:
         """Calculate summary statistics for the menu"""
         total_recipes = 0
-        total_calories = 0
-        total_protein = 0
+        library_recipes = 0
         cuisines = set()
 
         for week_data in monthly_menu["weeks"].values():
             for day_data in week_data["days"].values():
                 for recipe in day_data["meals"].values():
                     total_recipes += 1
-                    if "calories_per_serving" in recipe:
-                        total_calories += recipe["calories_per_serving"]
+                    if recipe.get("library_hit"):
+                        library_recipes += 1
                     if "cuisine" in recipe:
                         cuisines.add(recipe["cuisine"])
 
-        days_count = sum(len(week["days"]) for week in monthly_menu["weeks"].values())
+        # Daily, weekly and monthly nutrition as array reductions
+        nutrition = PlanNutrition.from_weeks(monthly_menu["weeks"])
 
-        return {
+        summary = {
             "total_unique_recipes": total_recipes,
             "cuisine_variety": list(cuisines),
-            "average_daily_calories": int(total_calories / days_count) if days_count > 0 else 0,
+            "average_daily_calories": int(nutrition.daily_averages()[CALORIES]),
+            "nutrition": nutrition.summary(),
             "generated_by": "AI Menu Generator",
             "ai_providers_used": self._get_active_providers()
         }
 
+        if self.recipe_cache:
+            summary["recipe_cache"] = self.recipe_cache.stats()
+
+        if self.recipe_library:
+            summary["recipe_library"] = {
+                "hits": library_recipes,
+                "hit_rate": round(library_recipes / total_recipes, 3) if total_recipes else 0.0,
+                "library_size": len(self.recipe_library.recipes),
+                **self.library_stats
+            }
+
+        if self.providers:
+            summary.update(self.provider_status())
+
+        if self.routing == "hedged":
+            summary["hedging"] = dict(self.hedge_stats)
+
+        if self.speculation_stats["requests"]:
+            summary["recipe_deadline"] = {"timeout": self.recipe_timeout, **self.speculation_stats}
+
+        if self.repair_stats["field_requests"]:
+            summary["response_repair"] = dict(self.repair_stats)
+
+        if self.stream_stats["aborted"]:
+            summary["stream_validation"] = dict(self.stream_stats)
+
+        if self.batch_job_stats["jobs"]:
+            summary["batch_jobs"] = {"backend": self.batch_backend.name, **self.batch_job_stats}
+
+        return summary
+
+    def provider_status(self) -> Dict:
+        """Rate limits, latency percentiles, circuit breaker state and usage for monitoring"""
+        return {
+            "rate_limits": rate_limiter_status(),
+            "provider_latency": latency_snapshot(),
+            "circuit_breakers": circuit_breaker_status(),
+            "model_routes": route_snapshot(),
+            "usage": usage_snapshot()
+        }
+
     def _get_active_providers(self) -> List[str]:
         """Get list of active AI providers"""
         providers = []
-        if self.anthropic_client:
+        if "claude" in self.providers:
             providers.append("Claude (Anthropic)")
-        if self.openai_client:
+        if "openai" in self.providers:
             providers.append("GPT-4 (OpenAI)")
+        if self.batch_job_stats["jobs"]:
+            providers.append(f"Batch jobs ({self.batch_backend.name})")
         if not providers:
             providers.append("Template System")
         return providers
 
+    async def close(self):
+        """Close pooled provider connections"""
+        for provider in self.providers.values():
+            await provider.close()
+
 # CLI Interface
 async def main():
     """Command line interface for AI menu generation"""
     import argparse
 
     parser = argparse.ArgumentParser(description="Generate AI-powered meal plans")
-    parser.add_argument("menu_type", choices=["mediterranean", "intermittent_fasting", "keto", "family_friendly"])
+    parser.add_argument("menu_type", nargs="+", choices=["mediterranean", "intermittent_fasting", "keto", "family_friendly"])
     parser.add_argument("--month", type=int, default=datetime.now().month)
     parser.add_argument("--year", type=int, default=datetime.now().year)
     parser.add_argument("--family-size", type=int, default=2)
     parser.add_argument("--budget", choices=["budget", "moderate", "premium"], default="moderate")
     parser.add_argument("--restrictions", nargs="+", help="Dietary restrictions")
     parser.add_argument("--output", help="Output filename")
+    parser.add_argument("--cache-dir", default=os.getenv("RECIPE_CACHE_DIR"),
+                        help="Reuse generated recipes from this on-disk cache")
+    parser.add_argument("--cache-variants", type=int, default=3,
+                        help="Recipe variants kept per unique set of requirements")
+    parser.add_argument("--batch-mode", choices=["day", "week", "variants", "job"],
+                        help="Request a whole day or week of recipes per AI call, one call per unique "
+                             "set of requirements, or submit every menu as one offline batch job")
+    parser.add_argument("--batch-backend", choices=["anthropic", "local"], default="anthropic",
+                        help="Batch job service for --batch-mode job (local runs FakeProvider offline)")
+    parser.add_argument("--poll-interval", type=float, default=30.0,
+                        help="Seconds between batch job status checks")
+    parser.add_argument("--routing", choices=["primary", "hedged"], default="primary",
+                        help="Hedge slow primary-provider calls with the secondary provider")
+    parser.add_argument("--recipe-timeout", type=float, default=os.getenv("AI_RECIPE_TIMEOUT"),
+                        help="Seconds before a slow AI recipe falls back to its template")
+    parser.add_argument("--model-route", action="append", default=[], metavar="MENU:MEAL=TIER",
+                        help="Route a menu type/meal category (or *) to the fast or large model tier")
+    parser.add_argument("--library", default=os.getenv("RECIPE_LIBRARY_PATH"),
+                        help="Reuse matching recipes from this RECIPE_DATABASE.txt export before calling AI")
+    parser.add_argument("--library-details", action="store_true",
+                        help="Fill in missing ingredients and steps of library recipes with a fast-tier AI call")
+    parser.add_argument("--journal", help="Checkpoint progress to this journal file, resuming it if present "
+                                           "(single menu type only)")
+    parser.add_argument("--prompt-report", action="store_true",
+                        help="Print estimated per-call prompt tokens and savings, then exit")
 
     args = parser.parse_args()
 
+    model_routes = {}
+    for route in args.model_route:
+        target, _, tier = route.partition("=")
+        menu, _, meal = target.partition(":")
+        model_routes[(menu or "*", meal or "*")] = tier
+
+    if args.journal and len(args.menu_type) > 1:
+        parser.error("--journal takes a single menu type")
+
+    if args.prompt_report:
+        builder = AIMenuGenerator(providers={}).prompt_builder
+        for menu_type, meal_category in itertools.product(args.menu_type, ["breakfast", "lunch", "dinner"]):
+            sample = RecipeRequirements(
+                menu_type=menu_type,
+                meal_category=meal_category,
+                cuisine_style=menu_type.replace("_", " ").title(),
+                target_calories=500,
+                target_protein=25,
+                dietary_restrictions=args.restrictions or [],
+                prep_time_max=30,
+                difficulty_level="medium",
+                season="winter",
+                family_size=args.family_size,
+                budget_level=args.budget,
+                equipment_available=["oven", "stovetop", "microwave"]
+            )
+            for provider_name in ("claude", "openai"):
+                report = builder.token_report(sample, provider_name)
+                print(json.dumps({"meal_category": meal_category, **report}, indent=2))
+        return
+
+    batch_backend = None
+    if args.batch_mode == "job":
+        if args.batch_backend == "local":
+            batch_backend = LocalBatchBackend()
+        else:
+            batch_backend = AnthropicBatchBackend(api_key=os.getenv("ANTHROPIC_API_KEY"))
+
     # Initialize generator with API keys from environment
     generator = AIMenuGenerator(
         anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-        openai_api_key=os.getenv("OPENAI_API_KEY")
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        recipe_cache=RecipeCache(args.cache_dir, variants_per_key=args.cache_variants) if args.cache_dir else None,
+        routing=args.routing,
+        recipe_timeout=float(args.recipe_timeout) if args.recipe_timeout else None,
+        model_routes=model_routes,
+        batch_backend=batch_backend,
+        recipe_library=RecipeLibrary.from_file(args.library) if args.library else None,
+        library_fill_details=args.library_details
     )
+    generator.batch_poll_interval = args.poll_interval
+
+    plans = [
+        {
+            "menu_type": menu_type,
+            "month": args.month,
+            "year": args.year,
+            "dietary_restrictions": args.restrictions,
+            "family_size": args.family_size,
+            "budget_level": args.budget
+        }
+        for menu_type in args.menu_type
+    ]
 
-    # Generate menu
-    print(f"🤖 Generating AI-powered {args.menu_type} menu for {args.month}/{args.year}...")
-
-    menu = await generator.generate_monthly_menu(
-        menu_type=args.menu_type,
-        month=args.month,
-        year=args.year,
-        dietary_restrictions=args.restrictions,
-        family_size=args.family_size,
-        budget_level=args.budget
-    )
+    # Generate menus
+    print(f"🤖 Generating AI-powered {', '.join(args.menu_type)} menu(s) for {args.month}/{args.year}...")
 
-    # Save to file
-    output_file = args.output or f"ai_{args.menu_type}_{args.month}_{args.year}.json"
-    with open(output_file, 'w') as f:
-        json.dump(menu, f, indent=2)
+    try:
+        if args.batch_mode == "job" and len(plans) > 1:
+            # One job for every menu type
+            menus = await generator.generate_monthly_menus(plans)
+        else:
+            menus = [
+                await generator.generate_monthly_menu(
+                    **plan, batch_mode=args.batch_mode, journal_path=args.journal
+                )
+                for plan in plans
+            ]
+    finally:
+        await generator.close()
+        if batch_backend:
+            await batch_backend.close()
+
+    for menu_type, menu in zip(args.menu_type, menus):
+        # Save to file
+        if args.output and len(menus) == 1:
+            output_file = args.output
+        else:
+            output_file = f"ai_{menu_type}_{args.month}_{args.year}.json"
+        with open(output_file, 'w') as f:
+            json.dump(menu, f, indent=2)
 
-    print(f"✅ Menu saved to {output_file}")
-    print(f"📊 Generated {menu['summary']['total_unique_recipes']} recipes")
-    print(f"🤖 Using: {', '.join(menu['summary']['ai_providers_used'])}")
+        print(f"✅ Menu saved to {output_file}")
+        print(f"📊 Generated {menu['summary']['total_unique_recipes']} recipes")
+        print(f"🤖 Using: {', '.join(menu['summary']['ai_providers_used'])}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -66,33 +66,52 @@ def get_menu_types():
 
 @app.route('/api/recipes/<menu_type>', methods=['GET'])
 def get_recipes_by_type(menu_type):
-    """Get all recipes for a menu type"""
-    recipes = agent.recipe_database.get(menu_type, {})
-    return jsonify(recipes)
+    """Get all recipes for a menu type, optionally filtered
+
+    Query parameters: category, cuisine, difficulty, min_calories,
+    max_calories, min_protein, max_protein. With any filter, a flat
+    list of matching recipes is returned.
+    """
+    filters = {key: request.args.get(key) for key in ('category', 'cuisine', 'difficulty')}
+    ranges = {key: request.args.get(key, type=float) for key in (
+        'min_calories', 'max_calories', 'min_protein', 'max_protein'
+    )}
+    if not any(filters.values()) and all(value is None for value in ranges.values()):
+        return jsonify({
+            category: [recipe.to_dict() for recipe in recipes]
+            for category, recipes in agent.recipe_database.as_nested(menu_type).items()
+        })
+
+    recipes = agent.recipe_database.select(
+        menu_type=menu_type,
+        calories=(ranges['min_calories'], ranges['max_calories']),
+        protein=(ranges['min_protein'], ranges['max_protein']),
+        **filters
+    )
+    return jsonify({"recipes": [recipe.to_dict() for recipe in recipes], "count": len(recipes)})
 
 @app.route('/api/recipe/<menu_type>/<recipe_id>', methods=['GET'])
 def get_recipe(menu_type, recipe_id):
     """Get specific recipe by ID"""
-    recipes = agent.recipe_database.get(menu_type, {})
-    for category in recipes.values():
-        for recipe in category:
-            if recipe.id == recipe_id:
-                return jsonify({
-                    "id": recipe.id,
-                    "name": recipe.name,
-                    "category": recipe.category,
-                    "cuisine": recipe.cuisine,
-                    "prep_time": recipe.prep_time,
-                    "cook_time": recipe.cook_time,
-                    "calories": recipe.calories,
-                    "protein": recipe.protein,
-                    "carbs": recipe.carbs,
-                    "fat": recipe.fat,
-                    "ingredients": recipe.ingredients,
-                    "instructions": recipe.instructions,
-                    "meal_type": recipe.meal_type
-                })
-    return jsonify({"error": "Recipe not found"}), 404
+    recipe = agent.recipe_database.get(recipe_id, menu_type)
+    if recipe is None:
+        return jsonify({"error": "Recipe not found"}), 404
+
+    return jsonify({
+        "id": recipe.id,
+        "name": recipe.name,
+        "category": recipe.category,
+        "cuisine": recipe.cuisine,
+        "prep_time": recipe.prep_time,
+        "cook_time": recipe.cook_time,
+        "calories": recipe.calories,
+        "protein": recipe.protein,
+        "carbs": recipe.carbs,
+        "fat": recipe.fat,
+        "ingredients": recipe.ingredients,
+        "instructions": recipe.instructions,
+        "meal_type": recipe.meal_type
+    })
 
 @app.route('/api/shopping_list', methods=['POST'])
 def generate_shopping_list():
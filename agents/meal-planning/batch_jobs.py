@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Batch Jobs
+Bulk asynchronous submission of recipe requests for offline runs (e.g.
+nightly pre-generation of next month's plans), via the Anthropic Message
+Batches API or a local stand-in batch server
+"""
+
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from ai_providers import AIProvider, AnthropicProvider, FakeProvider, ProviderRequest, ProviderResponse
+
+try:
+    import anthropic
+    ANTHROPIC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_AVAILABLE = False
+
+
+@dataclass
+class BatchJobStatus:
+    """Progress of a submitted batch job"""
+    job_id: str
+    state: str  # in_progress, canceling or ended
+    total: int = 0
+    succeeded: int = 0
+    errored: int = 0  # errored, canceled or expired requests
+
+    @property
+    def ended(self) -> bool:
+        return self.state == "ended"
+
+
+class BatchBackend:
+    """Base class for batch job services
+
+    Requests are keyed by a caller-chosen custom id (letters, digits, "_"
+    and "-", at most 64 characters); results come back under the same ids,
+    with None for requests the service could not complete.
+    """
+
+    name = "batch"
+    provider_name = "claude"  # provider whose prompt style and models requests use
+
+    async def submit(self, requests: Dict[str, ProviderRequest]) -> str:
+        """Submit every request as one job and return its id"""
+        raise NotImplementedError
+
+    async def status(self, job_id: str) -> BatchJobStatus:
+        raise NotImplementedError
+
+    async def results(self, job_id: str) -> Dict[str, Optional[ProviderResponse]]:
+        """Responses of an ended job by custom id"""
+        raise NotImplementedError
+
+    async def cancel(self, job_id: str):
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections held by the backend"""
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Claude via the Message Batches API
+
+    Jobs usually finish well within an hour (at most 24h) and cost half
+    of the equivalent interactive calls.
+    """
+
+    name = "anthropic-batch"
+    provider_name = AnthropicProvider.name
+
+    def __init__(self, api_key: str):
+        if not ANTHROPIC_AVAILABLE:
+            raise RuntimeError("The anthropic package is required for batch jobs")
+
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+        # Older SDKs only expose batches under the beta namespace
+        self.batches = getattr(self.client.messages, "batches", None) or self.client.beta.messages.batches
+        self._models: Dict[str, Dict[str, str]] = {}  # requested model per custom id, by job
+
+    async def submit(self, requests: Dict[str, ProviderRequest]) -> str:
+        batch = await self.batches.create(requests=[
+            {"custom_id": custom_id, "params": AnthropicProvider.message_params(request)}
+            for custom_id, request in requests.items()
+        ])
+        self._models[batch.id] = {custom_id: request.model for custom_id, request in requests.items()}
+        return batch.id
+
+    async def status(self, job_id: str) -> BatchJobStatus:
+        batch = await self.batches.retrieve(job_id)
+        counts = batch.request_counts
+        return BatchJobStatus(
+            job_id=job_id,
+            state=batch.processing_status,
+            total=counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired,
+            succeeded=counts.succeeded,
+            errored=counts.errored + counts.canceled + counts.expired
+        )
+
+    async def results(self, job_id: str) -> Dict[str, Optional[ProviderResponse]]:
+        models = self._models.get(job_id, {})
+        responses: Dict[str, Optional[ProviderResponse]] = {}
+
+        async for entry in await self.batches.results(job_id):
+            if entry.result.type != "succeeded":
+                responses[entry.custom_id] = None
+                continue
+            message = entry.result.message
+            responses[entry.custom_id] = AnthropicProvider.parse_message(
+                message, models.get(entry.custom_id, message.model)
+            )
+        return responses
+
+    async def cancel(self, job_id: str):
+        await self.batches.cancel(job_id)
+
+    async def close(self):
+        await self.client.close()
+
+
+class LocalBatchBackend(BatchBackend):
+    """In-process stand-in for a batch service, for offline runs and tests
+
+    Submitted jobs wait `queue_delay` seconds, then are worked through in
+    the background by `provider` (a FakeProvider by default) with up to
+    `concurrency` requests in flight. Like a remote service, it calls the
+    model directly, outside the client-side rate limits and retries, and a
+    failed request simply comes back as None.
+    """
+
+    name = "local-batch"
+
+    def __init__(
+        self,
+        provider: AIProvider = None,
+        concurrency: int = 16,
+        queue_delay: float = 0.0,
+        provider_name: str = "claude"
+    ):
+        self.provider = provider or FakeProvider(name="local-batch", latency_median=0.05)
+        self.concurrency = concurrency
+        self.queue_delay = queue_delay
+        self.provider_name = provider_name
+
+        self._ids = itertools.count(1)
+        self._jobs: Dict[str, Dict] = {}
+
+    async def submit(self, requests: Dict[str, ProviderRequest]) -> str:
+        job_id = f"localbatch_{next(self._ids):04d}"
+        job = {"requests": dict(requests), "results": {}, "state": "in_progress"}
+        job["task"] = asyncio.ensure_future(self._process(job))
+        self._jobs[job_id] = job
+        return job_id
+
+    async def _process(self, job: Dict):
+        await asyncio.sleep(self.queue_delay)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(custom_id: str, request: ProviderRequest):
+            async with semaphore:
+                try:
+                    # The service side: the model itself, not the rate-limited client
+                    job["results"][custom_id] = await self.provider._complete(request)
+                except Exception as e:
+                    logging.debug(f"Local batch request {custom_id} failed: {str(e)}")
+                    job["results"][custom_id] = None
+
+        try:
+            await asyncio.gather(*(run(custom_id, request) for custom_id, request in job["requests"].items()))
+        finally:
+            job["state"] = "ended"
+
+    def _job(self, job_id: str) -> Dict:
+        if job_id not in self._jobs:
+            raise KeyError(f"Unknown batch job: {job_id}")
+        return self._jobs[job_id]
+
+    async def status(self, job_id: str) -> BatchJobStatus:
+        job = self._job(job_id)
+        done = list(job["results"].values())
+        succeeded = sum(1 for response in done if response is not None)
+        return BatchJobStatus(
+            job_id=job_id,
+            state=job["state"],
+            total=len(job["requests"]),
+            succeeded=succeeded,
+            errored=len(done) - succeeded
+        )
+
+    async def results(self, job_id: str) -> Dict[str, Optional[ProviderResponse]]:
+        job = self._job(job_id)
+        if job["state"] != "ended":
+            raise RuntimeError(f"Batch job {job_id} has not ended")
+        return {custom_id: job["results"].get(custom_id) for custom_id in job["requests"]}
+
+    async def cancel(self, job_id: str):
+        job = self._job(job_id)
+        job["task"].cancel()
+        job["state"] = "ended"
+
+    async def close(self):
+        for job in self._jobs.values():
+            job["task"].cancel()
+        await self.provider.close()
+
+
+async def run_batch_job(
+    backend: BatchBackend,
+    requests: Dict[str, ProviderRequest],
+    poll_interval: float = 30.0,
+    timeout: float = None
+) -> Dict[str, Optional[ProviderResponse]]:
+    """Submit `requests` as one job, poll until it ends and return its results
+
+    Past `timeout` seconds the job is cancelled and asyncio.TimeoutError is
+    raised.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    job_id = await backend.submit(requests)
+    logging.info(f"Submitted batch job {job_id} with {len(requests)} requests to {backend.name}")
+
+    while True:
+        status = await backend.status(job_id)
+        if status.ended:
+            break
+        if timeout is not None and loop.time() - started >= timeout:
+            await backend.cancel(job_id)
+            raise asyncio.TimeoutError(f"Batch job {job_id} did not finish within {timeout:.0f}s")
+        logging.info(f"Batch job {job_id}: {status.succeeded + status.errored}/{status.total} done")
+        await asyncio.sleep(poll_interval)
+
+    results = await backend.results(job_id)
+    failed = sum(1 for response in results.values() if response is None)
+    logging.info(
+        f"Batch job {job_id} ended after {loop.time() - started:.1f}s: "
+        f"{len(results) - failed} succeeded, {failed} failed"
+    )
+    return results
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for AI meal plan generation
+Runs the generators against FakeProvider (or recorded responses) so concurrency,
+caching and batching can be compared reproducibly without API spend
+"""
+
+import argparse
+import asyncio
+import logging
+import shutil
+import tempfile
+import time
+
+from ai_providers import FakeProvider, RecordReplayProvider
+from ai_menu_generator import AIMenuGenerator
+from enhanced_agent import EnhancedMealPlanningAgent
+from recipe_cache import RecipeCache
+
+
+def build_provider(args):
+    """Fake provider, optionally wrapped to record/replay its responses"""
+    fake = FakeProvider(
+        latency_distribution=args.latency,
+        latency_median=args.latency_median,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    if args.replay_dir:
+        return RecordReplayProvider(args.replay_dir, inner=fake, mode="auto", replay_latency=True), fake
+    return fake, fake
+
+
+async def bench_agent(args, concurrency: int) -> dict:
+    """Time EnhancedMealPlanningAgent.generate_ai_monthly_plan at a concurrency level"""
+    provider, fake = build_provider(args)
+    agent = EnhancedMealPlanningAgent(providers={"claude": provider}, max_concurrency=concurrency)
+
+    started = time.perf_counter()
+    plan = await agent.generate_ai_monthly_plan(args.menu_type, args.month, args.year)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": f"agent concurrency={concurrency}",
+        "seconds": elapsed,
+        "calls": fake.calls,
+        "tokens": fake.input_tokens + fake.output_tokens,
+        "recipes": plan["month_summary"].get("ai_generated_recipes", 0)
+    }
+
+
+async def bench_generator(args, batch_mode: str = None, cache_dir: str = None) -> dict:
+    """Time AIMenuGenerator.generate_monthly_menu with a batch/cache configuration"""
+    provider, fake = build_provider(args)
+    generator = AIMenuGenerator(
+        providers={"claude": provider},
+        recipe_cache=RecipeCache(cache_dir) if cache_dir else None
+    )
+
+    started = time.perf_counter()
+    menu = await generator.generate_monthly_menu(args.menu_type, args.month, args.year, batch_mode=batch_mode)
+    elapsed = time.perf_counter() - started
+
+    label = f"generator batch={batch_mode or 'off'}"
+    if cache_dir:
+        label += " cache=on"
+    return {
+        "scenario": label,
+        "seconds": elapsed,
+        "calls": fake.calls,
+        "tokens": fake.input_tokens + fake.output_tokens,
+        "recipes": menu["summary"]["total_unique_recipes"]
+    }
+
+
+async def run(args):
+    results = []
+
+    for concurrency in args.concurrency:
+        results.append(await bench_agent(args, concurrency))
+
+    for batch_mode in [None, "day", "week", "variants"]:
+        results.append(await bench_generator(args, batch_mode=batch_mode))
+
+    # Cold then warm run against the same cache directory
+    cache_dir = tempfile.mkdtemp(prefix="recipe_cache_bench_")
+    try:
+        for _ in range(2):
+            results.append(await bench_generator(args, cache_dir=cache_dir))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark meal plan generation offline")
+    parser.add_argument("--menu-type", default="mediterranean",
+                        choices=["mediterranean", "intermittent_fasting", "keto", "family_friendly"])
+    parser.add_argument("--month", type=int, default=1)
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="Agent concurrency levels to compare")
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-median", type=float, default=0.05,
+                        help="Median simulated provider latency in seconds")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay-dir", help="Record fake responses here, then replay them")
+
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = asyncio.run(run(args))
+
+    print(f"\n{'Scenario':<36}{'Seconds':>10}{'Calls':>8}{'Tokens':>10}{'Recipes':>9}")
+    print("-" * 73)
+    for result in results:
+        print(f"{result['scenario']:<36}{result['seconds']:>10.2f}{result['calls']:>8}"
+              f"{result['tokens']:>10}{result['recipes']:>9}")
+
+
+if __name__ == "__main__":
+    main()
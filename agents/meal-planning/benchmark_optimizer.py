@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark for constraint-aware menu selection
+Optimizes whole months over the recipe library and compares latency and
+constraint hits with the independent random.choice selection it replaced
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from meal_planning_agent import MealPlanningAgent
+from menu_optimizer import MenuConstraints, MenuOptimizer, evaluate_month
+from recipe_library import RecipeLibrary
+
+DEFAULT_LIBRARY = Path(__file__).resolve().parents[2] / "RECIPE_DATABASE.txt"
+MENU_TYPES = ["mediterranean", "intermittent_fasting", "keto", "family_friendly"]
+
+
+def bench_menu_type(agent: MealPlanningAgent, menu_type: str, days: int, runs: int, seed: int) -> list:
+    """Random and optimized months for one menu type, averaged over runs"""
+    layouts = [agent.meal_layout(menu_type, day) for day in range(1, days + 1)]
+    constraints = MenuConstraints.for_menu(agent.menu_templates[menu_type], agent.nutrition_targets.get(menu_type))
+
+    rng = random.Random(seed)
+    results = []
+    for scenario in ("random.choice", "optimizer"):
+        seconds, reports = [], []
+        for run in range(runs):
+            started = time.perf_counter()
+            if scenario == "optimizer":
+                month = MenuOptimizer(constraints, seed=seed + run).optimize(layouts)
+            else:
+                month = [{slot: rng.choice(pool) for slot, pool in layout.items()} for layout in layouts]
+            seconds.append(time.perf_counter() - started)
+            reports.append(evaluate_month(month, constraints))
+
+        results.append({
+            "scenario": f"{menu_type} {scenario}",
+            "pool": sum(len(pool) for pool in layouts[0].values()),
+            "seconds": max(seconds),
+            "on_target": sum(report["days_on_target"] for report in reports) / runs,
+            "repeats": sum(report["repeats_in_window"] for report in reports) / runs,
+            "fish": sum(min(report["weekly_fish_meals"]) for report in reports) / runs,
+            "cuisines": sum(min(report["weekly_cuisines"]) for report in reports) / runs
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark constraint-aware menu selection")
+    parser.add_argument("--menu-type", nargs="+", default=MENU_TYPES, choices=MENU_TYPES)
+    parser.add_argument("--library", default=str(DEFAULT_LIBRARY), help="Recipe library export to select from")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="Fail if optimizing one month takes longer than this many seconds")
+
+    args = parser.parse_args()
+
+    agent = MealPlanningAgent()
+    added = agent.recipe_database.add_library(RecipeLibrary.from_file(args.library))
+    print(f"Catalog: {len(agent.recipe_database)} recipes ({added} from the library)")
+
+    results = []
+    for menu_type in args.menu_type:
+        results.extend(bench_menu_type(agent, menu_type, args.days, args.runs, args.seed))
+
+    print(f"\n{'Scenario':<36}{'Pool':>6}{'Seconds':>9}{'On target':>11}{'Repeats':>9}{'Fish/wk':>9}{'Cuisines':>10}")
+    print("-" * 90)
+    for result in results:
+        print(f"{result['scenario']:<36}{result['pool']:>6}{result['seconds']:>9.3f}{result['on_target']:>11.1f}"
+              f"{result['repeats']:>9.1f}{result['fish']:>9.1f}{result['cuisines']:>10.1f}")
+
+    slowest = max(result["seconds"] for result in results if result["scenario"].endswith("optimizer"))
+    print(f"\nSlowest optimized month: {slowest:.3f}s (budget {args.budget:.2f}s)")
+    if slowest > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
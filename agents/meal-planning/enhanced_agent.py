@@ -8,13 +8,22 @@ import json
 import os
 import logging
 import asyncio
+import random
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 import calendar
 
 from meal_planning_agent import MealPlanningAgent, Recipe, DayMenu, ShoppingList, MealPrepGuide
 from ai_menu_generator import AIMenuGenerator, RecipeRequirements
+from recipe_cache import RecipeCache
+from recipe_library import RecipeLibrary
+from plan_journal import PlanJournal
+from plan_budget import PlanBudget
+from plan_model import MonthlyPlan
+from provider_metrics import get_latency_histogram
+from usage_accounting import usage_report
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,19 +33,60 @@ logging.basicConfig(
 class EnhancedMealPlanningAgent(MealPlanningAgent):
     """Enhanced agent with AI capabilities"""
 
-    def __init__(self, anthropic_key: str = None, openai_key: str = None):
+    # DayMenu slot filled by each AI meal category
+    MEAL_SLOTS = {
+        "breakfast": "breakfast",
+        "break_fast": "breakfast",
+        "lunch": "lunch",
+        "main_meal": "lunch",
+        "snack": "afternoon_snack",
+        "dinner": "dinner"
+    }
+    DAY_SLOTS = ("breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner")
+
+    # Recipe sources that count as template (non-AI) recipes
+    FALLBACK_SOURCES = ("template", "database")
+
+    def __init__(
+        self,
+        anthropic_key: str = None,
+        openai_key: str = None,
+        max_concurrency: int = None,
+        providers: Dict = None
+    ):
         super().__init__()
 
+        # Persistent recipe cache is opt-in via RECIPE_CACHE_DIR
+        cache_dir = os.getenv('RECIPE_CACHE_DIR')
+        recipe_cache = RecipeCache(
+            cache_dir,
+            variants_per_key=int(os.getenv('RECIPE_CACHE_VARIANTS', '3'))
+        ) if cache_dir else None
+
+        # Existing recipes are reused before any AI call when RECIPE_LIBRARY_PATH is set
+        library_path = os.getenv('RECIPE_LIBRARY_PATH')
+        recipe_library = RecipeLibrary.from_file(library_path) if library_path else None
+
         # Initialize AI generator
         self.ai_generator = AIMenuGenerator(
             anthropic_api_key=anthropic_key or os.getenv('ANTHROPIC_API_KEY'),
-            openai_api_key=openai_key or os.getenv('OPENAI_API_KEY')
+            openai_api_key=openai_key or os.getenv('OPENAI_API_KEY'),
+            recipe_cache=recipe_cache,
+            recipe_library=recipe_library,
+            providers=providers,
+            recipe_timeout=float(os.getenv('AI_RECIPE_TIMEOUT')) if os.getenv('AI_RECIPE_TIMEOUT') else None
         )
 
-        self.ai_enabled = bool(anthropic_key or openai_key or
+        self.ai_enabled = bool(providers or anthropic_key or openai_key or
                                os.getenv('ANTHROPIC_API_KEY') or
                                os.getenv('OPENAI_API_KEY'))
 
+        # Max in-flight recipe generations across all days and meals
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv('AI_MAX_CONCURRENCY', '1')))
+
+        # Extra attempts for a failed meal before falling back for that slot only
+        self.meal_retries = 1
+
         if self.ai_enabled:
             logging.info("AI generation enabled")
         else:
@@ -48,32 +98,47 @@ class EnhancedMealPlanningAgent(MealPlanningAgent):
         month: int,
         year: int,
         custom_requirements: Dict = None,
-        use_ai: bool = True
+        use_ai: bool = True,
+        concurrency: int = None,
+        journal_path: str = None,
+        deadline: float = None
     ) -> Dict:
-        """Generate monthly plan with AI-enhanced recipes"""
+        """Generate monthly plan with AI-enhanced recipes
+
+        Days and meals are generated concurrently, with at most `concurrency`
+        recipe requests in flight (defaults to the agent's max_concurrency).
+        With `journal_path`, each finished meal and day is checkpointed there
+        and an existing journal is resumed, generating only what is missing.
+        With `deadline` (seconds), meals that no longer fit the budget get
+        template recipes and in-flight AI calls are cut off when it expires;
+        meta["latency_budget"] reports the budget used and degraded days.
+        """
+
+        budget = PlanBudget(deadline, initial_estimate=self._expected_recipe_latency()) if deadline else None
+
+        journal = PlanJournal(journal_path, {
+            "menu_type": menu_type,
+            "month": month,
+            "year": year,
+            "custom_requirements": custom_requirements or {},
+            "use_ai": use_ai
+        }) if journal_path else None
 
         # Get month info
         month_name = calendar.month_name[month]
         days_in_month = calendar.monthrange(year, month)[1]
 
-        # Initialize plan structure
-        monthly_plan = {
-            "meta": {
-                "menu_type": menu_type,
-                "month": month_name,
-                "year": year,
-                "days_in_month": days_in_month,
-                "generated_date": datetime.now().isoformat(),
-                "ai_enabled": self.ai_enabled and use_ai,
-                "nutrition_targets": self.nutrition_targets.get(menu_type, {}),
-                "custom_requirements": custom_requirements or {}
-            },
-            "daily_menus": {},
-            "weekly_shopping_lists": {},
-            "weekly_prep_guides": {},
-            "recipe_collection": {},
-            "month_summary": {}
-        }
+        # Days reference recipes by id instead of embedding a copy each
+        plan = MonthlyPlan({
+            "menu_type": menu_type,
+            "month": month_name,
+            "year": year,
+            "days_in_month": days_in_month,
+            "generated_date": datetime.now().isoformat(),
+            "ai_enabled": self.ai_enabled and use_ai,
+            "nutrition_targets": self.nutrition_targets.get(menu_type, {}),
+            "custom_requirements": custom_requirements or {}
+        })
 
         # Determine season
         seasons = {
@@ -88,38 +153,74 @@ class EnhancedMealPlanningAgent(MealPlanningAgent):
         ai_recipe_count = 0
         template_recipe_count = 0
 
-        # Generate daily menus
-        for day in range(1, days_in_month + 1):
+        # Shared limit on in-flight recipe generations across days and meals
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.max_concurrency))
+
+        async def build_day(day: int):
             date_str = f"{year}-{month:02d}-{day:02d}"
 
+            recorded = journal.day(f"day_{day}") if journal else None
+            if recorded is not None:
+                return self._day_menu_from_dict(recorded["menu"]), recorded["sources"], recorded.get("usage", {})
+
+            daily_menu = None
+            usage = {}
             if self.ai_enabled and use_ai:
-                # Try AI generation
+                # Try AI generation; failed meals fall back individually
                 try:
-                    daily_menu = await self._generate_ai_daily_menu(
-                        menu_type, date_str, day, season, custom_requirements
+                    daily_menu, sources, usage = await self._generate_ai_daily_menu(
+                        menu_type, date_str, day, season, custom_requirements, semaphore, journal, budget
                     )
-                    ai_recipe_count += len([m for m in daily_menu.__dict__.values()
-                                          if isinstance(m, Recipe)])
                 except Exception as e:
                     logging.warning(f"AI generation failed for day {day}: {str(e)}")
-                    # Fallback to template
-                    daily_menu = self.generate_daily_menu(menu_type, date_str, day)
-                    template_recipe_count += len([m for m in daily_menu.__dict__.values()
-                                                 if isinstance(m, Recipe)])
-            else:
-                # Use template generation
+
+            if daily_menu is None:
+                # Use template generation (or fallback after AI failure)
                 daily_menu = self.generate_daily_menu(menu_type, date_str, day)
-                template_recipe_count += len([m for m in daily_menu.__dict__.values()
-                                             if isinstance(m, Recipe)])
+                sources = {
+                    slot: "database" for slot in self.DAY_SLOTS
+                    if isinstance(getattr(daily_menu, slot), Recipe)
+                }
+
+            if journal:
+                journal.record_day(f"day_{day}", {"menu": daily_menu.to_dict(), "sources": sources, "usage": usage})
+            return daily_menu, sources, usage
+
+        # Generate daily menus; gather keeps results in day order
+        day_results = await asyncio.gather(
+            *(build_day(day) for day in range(1, days_in_month + 1))
+        )
 
-            monthly_plan["daily_menus"][f"day_{day}"] = asdict(daily_menu)
+        recipe_sources: Dict[str, int] = {}
+        for day, (daily_menu, sources, _) in enumerate(day_results, start=1):
+            # Count provenance per meal slot, not per day
+            for source in sources.values():
+                recipe_sources[source] = recipe_sources.get(source, 0) + 1
+                if source in self.FALLBACK_SOURCES:
+                    template_recipe_count += 1
+                else:
+                    ai_recipe_count += 1
+
+            plan.add_day(f"day_{day}", daily_menu, recipe_sources=sources)
 
             # Progress indicator
             if day % 7 == 0:
                 logging.info(f"Completed week {day // 7} of {menu_type} plan generation")
 
-        # Generate weekly shopping lists
+        # Plan structure with each recipe converted once and shared by its days
+        # (recipe_collection included)
+        monthly_plan = plan.to_legacy()
+
+        # Tokens, latency and cost of the AI calls behind this plan
         weeks = self.organize_days_into_weeks(days_in_month)
+        monthly_plan["meta"]["usage"] = usage_report(
+            (f"week_{week_num}", f"day_{day}", slot, slot_usage)
+            for week_num, week_days in weeks.items()
+            for day in week_days
+            for slot, slot_usage in day_results[day - 1][2].items()
+        )
+
+        # Generate weekly shopping lists
         for week_num, week_days in weeks.items():
             shopping_list = self._generate_enhanced_shopping_list(monthly_plan, week_days, week_num)
             monthly_plan["weekly_shopping_lists"][f"week_{week_num}"] = asdict(shopping_list)
@@ -129,28 +230,64 @@ class EnhancedMealPlanningAgent(MealPlanningAgent):
             prep_guide = self._generate_enhanced_prep_guide(monthly_plan, week_num, menu_type)
             monthly_plan["weekly_prep_guides"][f"week_{week_num}"] = asdict(prep_guide)
 
-        # Compile recipe collection
-        monthly_plan["recipe_collection"] = self.compile_recipe_collection(monthly_plan)
-
         # Generate enhanced month summary
         monthly_plan["month_summary"] = self._generate_enhanced_summary(
             monthly_plan, ai_recipe_count, template_recipe_count
         )
+        monthly_plan["month_summary"]["recipe_sources"] = recipe_sources
+        monthly_plan["month_summary"]["ai_usage"] = monthly_plan["meta"]["usage"]["total"]
+
+        if budget:
+            monthly_plan["meta"]["latency_budget"] = budget.report()
+
+        if journal and not journal.completed:
+            journal.mark_complete()
 
         logging.info(f"Successfully generated {menu_type} plan for {month_name} {year}")
         logging.info(f"AI recipes: {ai_recipe_count}, Template recipes: {template_recipe_count}")
 
         return monthly_plan
 
+    async def resume_ai_monthly_plan(
+        self,
+        journal_path: str,
+        concurrency: int = None,
+        deadline: float = None
+    ) -> Dict:
+        """Finish a plan from its journal, generating only the missing days and meals"""
+        journal = PlanJournal(journal_path)
+        return await self.generate_ai_monthly_plan(
+            **journal.params, concurrency=concurrency, journal_path=journal_path, deadline=deadline
+        )
+
+    def _day_menu_from_dict(self, data: Dict) -> DayMenu:
+        """Rebuild a DayMenu checkpointed with to_dict"""
+        meals = {
+            slot: Recipe.from_dict(data[slot]) if data.get(slot) else None
+            for slot in self.DAY_SLOTS
+        }
+        return DayMenu(date=data["date"], prep_notes=data.get("prep_notes"), **meals)
+
     async def _generate_ai_daily_menu(
         self,
         menu_type: str,
         date_str: str,
         day_number: int,
         season: str,
-        custom_requirements: Dict = None
-    ) -> DayMenu:
-        """Generate daily menu using AI"""
+        custom_requirements: Dict = None,
+        semaphore: asyncio.Semaphore = None,
+        journal: PlanJournal = None,
+        budget: PlanBudget = None
+    ) -> Tuple[DayMenu, Dict[str, str], Dict[str, Dict]]:
+        """Generate daily menu using AI
+
+        All meals of the day are requested concurrently; `semaphore` caps the
+        number of recipe requests in flight when shared across days. Meals
+        already in `journal` are reused, and new ones are recorded there.
+        A failed meal is retried, then replaced on its own by a database or
+        template recipe. Returns the menu, each slot's recipe source and the
+        AI usage of each slot that made provider calls.
+        """
 
         custom_requirements = custom_requirements or {}
         family_size = custom_requirements.get('family_size', 2)
@@ -163,11 +300,11 @@ class EnhancedMealPlanningAgent(MealPlanningAgent):
         else:
             meal_categories = ["breakfast", "lunch", "dinner", "snack"]
 
-        recipes = {}
+        meal_requirements = []
 
         for meal_category in meal_categories:
             # Create requirements for this meal
-            requirements = RecipeRequirements(
+            meal_requirements.append(RecipeRequirements(
                 menu_type=menu_type,
                 meal_category=meal_category,
                 cuisine_style=self._get_cuisine_rotation(menu_type, day_number),
@@ -180,41 +317,152 @@ class EnhancedMealPlanningAgent(MealPlanningAgent):
                 family_size=family_size,
                 budget_level=budget_level,
                 equipment_available=["oven", "stovetop", "microwave"]
-            )
+            ))
 
-            # Generate recipe using AI
-            ai_recipe = await self.ai_generator.generate_recipe(requirements)
-
-            # Convert to Recipe dataclass
-            recipe = Recipe(
-                id=ai_recipe.get('id', f"{menu_type}_{meal_category}_{day_number}"),
-                name=ai_recipe.get('name', f"AI {meal_category.title()}"),
-                category=meal_category,
-                cuisine=ai_recipe.get('cuisine', 'International'),
-                prep_time=ai_recipe.get('prep_time', '15 minutes'),
-                cook_time=ai_recipe.get('cook_time', ''),
-                calories=ai_recipe.get('calories_per_serving', 400),
-                protein=ai_recipe.get('protein_per_serving', '20g'),
-                carbs=ai_recipe.get('carbs_per_serving', '40g'),
-                fat=ai_recipe.get('fat_per_serving', '15g'),
-                ingredients=ai_recipe.get('ingredients', []),
-                instructions=ai_recipe.get('instructions', []),
-                meal_type=meal_category,
-                difficulty=ai_recipe.get('difficulty', 'easy')
-            )
+        async def generate_meal(requirements: RecipeRequirements) -> Tuple[Recipe, str, Optional[Dict]]:
+            key = f"day_{day_number}/{requirements.meal_category}"
+            ai_recipe = journal.meal(key) if journal else None
+
+            attempt = 0
+            while ai_recipe is None:
+                try:
+                    ai_recipe = await self._generate_limited(requirements, semaphore, budget)
+                except Exception as e:
+                    if attempt >= self.meal_retries:
+                        logging.warning(
+                            f"AI {requirements.meal_category} failed for day {day_number}: {str(e)} - using fallback"
+                        )
+                        recipe, source = self._fallback_meal(requirements, day_number)
+                        return recipe, source, None
+                    attempt += 1
+                    continue
+
+                if ai_recipe is None:
+                    # Out of budget: no AI call was started for this meal
+                    budget.mark_degraded(day_number)
+                    recipe, source = self._fallback_meal(requirements, day_number)
+                    return recipe, source, None
+
+                if ai_recipe.get('generated_by') == 'template':
+                    # The generator answers a failed AI call with its template; try
+                    # again while a provider is still ready (the budget check above
+                    # stops retries that can't finish in time). A template for a
+                    # missed recipe deadline is final: a retry would double it.
+                    if (attempt < self.meal_retries and not ai_recipe.get('deadline_fallback')
+                            and self.ai_generator._ready_providers()):
+                        attempt += 1
+                        ai_recipe = None
+                        continue
+                    if budget and budget.remaining() <= 0:
+                        budget.mark_degraded(day_number)
+                elif journal:
+                    # Only paid AI recipes are checkpointed; templates are retried on resume
+                    journal.record_meal(key, ai_recipe)
+
+            recipe = self._recipe_from_ai(ai_recipe, menu_type, requirements.meal_category, day_number)
+            return recipe, ai_recipe.get('generated_by', 'ai'), ai_recipe.get('usage')
+
+        # Meals fail independently, so one bad slot never discards the others
+        results = await asyncio.gather(
+            *(generate_meal(requirements) for requirements in meal_requirements)
+        )
 
+        recipes = {}
+        sources = {}
+        usage = {}
+        for meal_category, (recipe, source, recipe_usage) in zip(meal_categories, results):
+            slot = self.MEAL_SLOTS[meal_category]
             recipes[meal_category] = recipe
+            sources[slot] = source
+            if recipe_usage:
+                usage[slot] = recipe_usage
+
+        slot_recipes = {self.MEAL_SLOTS[category]: recipe for category, recipe in recipes.items()}
 
         # Build DayMenu
-        return DayMenu(
+        daily_menu = DayMenu(
             date=date_str,
-            breakfast=recipes.get('breakfast') or recipes.get('break_fast'),
-            morning_snack=recipes.get('morning_snack'),
-            lunch=recipes.get('lunch') or recipes.get('main_meal'),
-            afternoon_snack=recipes.get('afternoon_snack') or recipes.get('snack'),
-            dinner=recipes.get('dinner'),
+            breakfast=slot_recipes.get('breakfast'),
+            morning_snack=slot_recipes.get('morning_snack'),
+            lunch=slot_recipes.get('lunch'),
+            afternoon_snack=slot_recipes.get('afternoon_snack'),
+            dinner=slot_recipes.get('dinner'),
             prep_notes=self._generate_ai_prep_notes(recipes)
         )
+        return daily_menu, sources, usage
+
+    def _recipe_from_ai(self, ai_recipe: Dict, menu_type: str, meal_category: str, day_number: int) -> Recipe:
+        """Convert an AI recipe dict to a Recipe"""
+        return Recipe(
+            id=ai_recipe.get('id', f"{menu_type}_{meal_category}_{day_number}"),
+            name=ai_recipe.get('name', f"AI {meal_category.title()}"),
+            category=meal_category,
+            cuisine=ai_recipe.get('cuisine', 'International'),
+            prep_time=ai_recipe.get('prep_time', '15 minutes'),
+            cook_time=ai_recipe.get('cook_time', ''),
+            calories=ai_recipe.get('calories_per_serving', 400),
+            protein=ai_recipe.get('protein_per_serving', '20g'),
+            carbs=ai_recipe.get('carbs_per_serving', '40g'),
+            fat=ai_recipe.get('fat_per_serving', '15g'),
+            ingredients=ai_recipe.get('ingredients', []),
+            instructions=ai_recipe.get('instructions', []),
+            meal_type=meal_category,
+            difficulty=ai_recipe.get('difficulty', 'easy')
+        )
+
+    def _fallback_meal(self, requirements: RecipeRequirements, day_number: int) -> Tuple[Recipe, str]:
+        """Replacement for one failed AI meal: a database recipe, else a generated template"""
+        category = "snacks" if requirements.meal_category == "snack" else requirements.meal_category
+        candidates = self.recipe_database.by_category(requirements.menu_type, category)
+        if candidates:
+            return random.choice(candidates), "database"
+
+        template = self.ai_generator._generate_recipe_template(requirements)
+        return self._recipe_from_ai(template, requirements.menu_type, requirements.meal_category, day_number), "template"
+
+    async def _generate_limited(
+        self,
+        requirements: RecipeRequirements,
+        semaphore: asyncio.Semaphore = None,
+        budget: PlanBudget = None
+    ) -> Optional[Dict]:
+        """Generate a recipe, holding a concurrency slot while in flight
+
+        With a `budget`, returns None rather than start a call that is not
+        expected to finish in time; started calls are cut off at the deadline.
+        """
+
+        if semaphore is None:
+            return await self._generate_within_budget(requirements, budget)
+
+        async with semaphore:
+            return await self._generate_within_budget(requirements, budget)
+
+    async def _generate_within_budget(
+        self,
+        requirements: RecipeRequirements,
+        budget: PlanBudget = None
+    ) -> Optional[Dict]:
+        if budget is None:
+            return await self.ai_generator.generate_recipe(requirements)
+
+        # Checked once a slot is free, so queueing time counts against the budget
+        if budget.should_degrade():
+            return None
+
+        started = time.monotonic()
+        recipe = await self.ai_generator.generate_recipe(requirements, timeout=budget.remaining())
+        if recipe.get('generated_by') not in ('template', 'library') and not recipe.get('cache_hit'):
+            budget.record(time.monotonic() - started)
+        return recipe
+
+    def _expected_recipe_latency(self) -> Optional[float]:
+        """Starting latency estimate for a budget: the primary provider's recent median"""
+        for provider in self.ai_generator.providers.values():
+            histogram = get_latency_histogram(provider.name)
+            if histogram.total:
+                return histogram.percentile(0.5)
+        return None
 
     def _get_cuisine_rotation(self, menu_type: str, day_number: int) -> str:
         """Get cuisine style based on rotation"""
@@ -269,11 +517,7 @@ class EnhancedMealPlanningAgent(MealPlanningAgent):
         notes = []
 
         # Analyze recipes for prep optimization
-        total_prep_time = sum(
-            self._parse_time(r.prep_time)
-            for r in recipes.values()
-            if r and r.prep_time
-        )
+        total_prep_time = sum(r.prep_minutes for r in recipes.values() if r)
 
         if total_prep_time > 60:
             notes.append(f"Consider batch prepping - total prep time: {total_prep_time} minutes")
@@ -722,11 +966,14 @@ def generate_plan_sync(
     month: int,
     year: int,
     custom_requirements: Dict = None,
-    use_ai: bool = True
+    use_ai: bool = True,
+    concurrency: int = None,
+    journal_path: str = None,
+    deadline: float = None
 ) -> Dict:
     """Synchronous wrapper for async plan generation"""
 
-    agent = EnhancedMealPlanningAgent()
+    agent = EnhancedMealPlanningAgent(max_concurrency=concurrency)
 
     # Create event loop and run async function
     import asyncio
@@ -736,7 +983,8 @@ def generate_plan_sync(
     try:
         plan = loop.run_until_complete(
             agent.generate_ai_monthly_plan(
-                menu_type, month, year, custom_requirements, use_ai
+                menu_type, month, year, custom_requirements, use_ai,
+                journal_path=journal_path, deadline=deadline
             )
         )
         return plan
@@ -6,59 +6,255 @@ Generates complete monthly meal plans with recipes, shopping lists, and prep str
 
 import json
 import random
+import re
+import sys
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
+from dataclasses import FrozenInstanceError, dataclass, asdict
+from typing import List, Dict, Optional, Tuple
 import calendar
 
-@dataclass
+from menu_optimizer import MenuConstraints, MenuOptimizer
+from nutrition_engine import CALORIES, NutritionTargets, PlanNutrition
+from plan_model import MonthlyPlan
+from recipe_catalog import RecipeCatalog
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(h(?:ou)?rs?|min(?:ute)?s?)\b")
+
+
+def parse_grams(value) -> int:
+    """'18g' / '18.5 g' / 18 -> whole grams (0 when absent)"""
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    match = _NUMBER_RE.search(value or "")
+    return int(round(float(match.group()))) if match else 0
+
+
+def parse_minutes(value) -> int:
+    """'15 minutes' / '1 hour 30 minutes' / 15 -> whole minutes (0 when absent)"""
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    text = (value or "").lower()
+
+    minutes = 0.0
+    for amount, unit in _DURATION_RE.findall(text):
+        minutes += float(amount) * (60 if unit.startswith("h") else 1)
+    if not minutes:
+        match = _NUMBER_RE.search(text)
+        if match:
+            minutes = float(match.group())
+        elif "hour" in text:
+            minutes = 60
+    return int(round(minutes))
+
+
+def format_minutes(minutes: int) -> str:
+    """60 -> '1 hour', 90 -> '1 hour 30 minutes', 15 -> '15 minutes', 0 -> ''"""
+    if not minutes:
+        return ""
+    hours, rest = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    if rest:
+        parts.append(f"{rest} minute{'s' if rest != 1 else ''}")
+    return " ".join(parts)
+
+
+def _intern_text(value):
+    return sys.intern(value) if type(value) is str else value
+
+
 class Recipe:
-    id: str
-    name: str
-    category: str
-    cuisine: str
-    prep_time: str
-    cook_time: str = ""
-    calories: int = 0
-    protein: str = "0g"
-    carbs: str = "0g"
-    fat: str = "0g"
-    ingredients: List[str] = None
-    instructions: List[str] = None
-    notes: str = ""
-    difficulty: str = "easy"  # easy, medium, hard
-    meal_type: str = ""  # breakfast, lunch, dinner, snack
+    """An immutable recipe with nutrition in whole grams and times in minutes
+
+    Takes the same arguments as before ("18g", "15 minutes"), parsed once
+    here; `protein`, `carbs`, `fat`, `prep_time` and `cook_time` are string
+    views for output. A prep time mentioning "overnight" keeps that as a
+    flag. Text is interned and lists are stored as tuples, so recipes
+    repeated across plans and libraries share their storage.
+    """
+
+    __slots__ = (
+        "id", "name", "category", "cuisine", "prep_minutes", "prep_overnight", "cook_minutes", "calories",
+        "protein_g", "carbs_g", "fat_g", "ingredients", "instructions", "notes", "difficulty", "meal_type"
+    )
+
+    # Keys of the dict form, in the order plans have always been written with
+    FIELDS = (
+        "id", "name", "category", "cuisine", "prep_time", "cook_time", "calories", "protein", "carbs",
+        "fat", "ingredients", "instructions", "notes", "difficulty", "meal_type"
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        category: str,
+        cuisine: str,
+        prep_time="",
+        cook_time="",
+        calories: int = 0,
+        protein="0g",
+        carbs="0g",
+        fat="0g",
+        ingredients: List[str] = None,
+        instructions: List[str] = None,
+        notes: str = "",
+        difficulty: str = "easy",  # easy, medium, hard
+        meal_type: str = ""  # breakfast, lunch, dinner, snack
+    ):
+        init = object.__setattr__
+        init(self, "id", _intern_text(id))
+        init(self, "name", _intern_text(name))
+        init(self, "category", _intern_text(category))
+        init(self, "cuisine", _intern_text(cuisine))
+        init(self, "prep_minutes", parse_minutes(prep_time))
+        init(self, "prep_overnight", isinstance(prep_time, str) and "overnight" in prep_time.lower())
+        init(self, "cook_minutes", parse_minutes(cook_time))
+        init(self, "calories", int(calories or 0))
+        init(self, "protein_g", parse_grams(protein))
+        init(self, "carbs_g", parse_grams(carbs))
+        init(self, "fat_g", parse_grams(fat))
+        init(self, "ingredients", tuple(_intern_text(item) for item in ingredients or ()))
+        init(self, "instructions", tuple(_intern_text(step) for step in instructions or ()))
+        init(self, "notes", notes)
+        init(self, "difficulty", _intern_text(difficulty))
+        init(self, "meal_type", _intern_text(meal_type))
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    @property
+    def protein(self) -> str:
+        return f"{self.protein_g}g"
+
+    @property
+    def carbs(self) -> str:
+        return f"{self.carbs_g}g"
+
+    @property
+    def fat(self) -> str:
+        return f"{self.fat_g}g"
+
+    @property
+    def prep_time(self) -> str:
+        text = format_minutes(self.prep_minutes)
+        if self.prep_overnight:
+            return f"{text} + overnight" if text else "overnight"
+        return text
+
+    @property
+    def cook_time(self) -> str:
+        return format_minutes(self.cook_minutes)
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash((self.id, self.name, self.calories, self.prep_minutes))
+
+    def __repr__(self):
+        return f"Recipe(id={self.id!r}, name={self.name!r}, calories={self.calories})"
+
+    def __reduce__(self):
+        return (self.__class__.from_dict, (self.to_dict(),))
+
+    def to_dict(self) -> Dict:
+        """The dict form written to plans and served by the API"""
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        data["ingredients"] = list(self.ingredients)
+        data["instructions"] = list(self.instructions)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Recipe":
+        return cls(**{name: data[name] for name in cls.FIELDS if name in data})
+
+    def replace(self, **changes) -> "Recipe":
+        return self.from_dict({**self.to_dict(), **changes})
 
-    def __post_init__(self):
-        if self.ingredients is None:
-            self.ingredients = []
-        if self.instructions is None:
-            self.instructions = []
 
-@dataclass
 class DayMenu:
-    date: str
-    breakfast: Recipe
-    morning_snack: Optional[Recipe]
-    lunch: Recipe
-    afternoon_snack: Optional[Recipe]
-    dinner: Recipe
-    daily_calories: int = 0
-    daily_protein: str = "0g"
-    prep_notes: List[str] = None
-
-    def __post_init__(self):
-        if self.prep_notes is None:
-            self.prep_notes = []
-        self.calculate_daily_totals()
-
-    def calculate_daily_totals(self):
-        total_calories = self.breakfast.calories + self.lunch.calories + self.dinner.calories
-        if self.morning_snack:
-            total_calories += self.morning_snack.calories
-        if self.afternoon_snack:
-            total_calories += self.afternoon_snack.calories
-        self.daily_calories = total_calories
+    """An immutable day of meals; daily calories and protein are totalled at construction"""
+
+    __slots__ = (
+        "date", "breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner",
+        "daily_calories", "daily_protein_g", "prep_notes"
+    )
+
+    MEAL_SLOTS = ("breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner")
+
+    def __init__(
+        self,
+        date: str,
+        breakfast: Optional[Recipe],
+        morning_snack: Optional[Recipe],
+        lunch: Optional[Recipe],
+        afternoon_snack: Optional[Recipe],
+        dinner: Optional[Recipe],
+        daily_calories: int = 0,  # recomputed from the meals
+        daily_protein="0g",  # recomputed from the meals
+        prep_notes: List[str] = None
+    ):
+        init = object.__setattr__
+        init(self, "date", date)
+        init(self, "breakfast", breakfast)
+        init(self, "morning_snack", morning_snack)
+        init(self, "lunch", lunch)
+        init(self, "afternoon_snack", afternoon_snack)
+        init(self, "dinner", dinner)
+        init(self, "prep_notes", tuple(prep_notes or ()))
+        calories, protein = self.calculate_daily_totals()
+        init(self, "daily_calories", calories)
+        init(self, "daily_protein_g", protein)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def calculate_daily_totals(self) -> Tuple[int, int]:
+        """Calories and protein grams of every planned meal (days may skip any slot)"""
+        meals = self.meals()
+        return sum(recipe.calories for recipe in meals), sum(recipe.protein_g for recipe in meals)
+
+    def meals(self) -> List[Recipe]:
+        return [getattr(self, slot) for slot in self.MEAL_SLOTS if getattr(self, slot) is not None]
+
+    @property
+    def daily_protein(self) -> str:
+        return f"{self.daily_protein_g}g"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"DayMenu(date={self.date!r}, daily_calories={self.daily_calories})"
+
+    def to_dict(self) -> Dict:
+        """The dict form written to plans and journals"""
+        data = {"date": self.date}
+        for slot in self.MEAL_SLOTS:
+            recipe = getattr(self, slot)
+            data[slot] = recipe.to_dict() if recipe is not None else None
+        data["daily_calories"] = self.daily_calories
+        data["daily_protein"] = self.daily_protein
+        data["prep_notes"] = list(self.prep_notes)
+        return data
 
 @dataclass
 class ShoppingList:
@@ -84,11 +280,12 @@ class MealPrepGuide:
 
 class MealPlanningAgent:
     def __init__(self):
-        self.recipe_database = self.load_recipe_database()
+        self.recipe_database = RecipeCatalog.from_nested(self.load_recipe_database())
         self.menu_templates = self.load_menu_templates()
         self.nutrition_targets = self.load_nutrition_targets()
+        self.last_selection_report: Dict = {}
 
-    def load_recipe_database(self) -> Dict[str, List[Recipe]]:
+    def load_recipe_database(self) -> Dict[str, Dict[str, List[Recipe]]]:
         """Load recipes organized by menu type and category"""
         return {
             "mediterranean": {
@@ -365,28 +562,29 @@ class MealPlanningAgent:
         month_name = calendar.month_name[month]
         days_in_month = calendar.monthrange(year, month)[1]
 
-        # Initialize plan structure
-        monthly_plan = {
-            "meta": {
-                "menu_type": menu_type,
-                "month": month_name,
-                "year": year,
-                "days_in_month": days_in_month,
-                "generated_date": datetime.now().isoformat(),
-                "nutrition_targets": self.nutrition_targets.get(menu_type, {})
-            },
-            "daily_menus": {},
-            "weekly_shopping_lists": {},
-            "weekly_prep_guides": {},
-            "recipe_collection": {},
-            "month_summary": {}
-        }
+        # Days reference recipes by id instead of embedding a copy each
+        plan = MonthlyPlan({
+            "menu_type": menu_type,
+            "month": month_name,
+            "year": year,
+            "days_in_month": days_in_month,
+            "generated_date": datetime.now().isoformat(),
+            "nutrition_targets": self.nutrition_targets.get(menu_type, {})
+        })
+
+        # Choose the whole month's meals at once, so calorie, protein, fish,
+        # cuisine and no-repeat constraints span days and weeks
+        month_meals = self.select_meals(menu_type, list(range(1, days_in_month + 1)))
+        plan.meta["meal_selection"] = self.last_selection_report
 
         # Generate daily menus
-        for day in range(1, days_in_month + 1):
+        for day, meals in enumerate(month_meals, 1):
             date_str = f"{year}-{month:02d}-{day:02d}"
-            daily_menu = self.generate_daily_menu(menu_type, date_str, day)
-            monthly_plan["daily_menus"][f"day_{day}"] = asdict(daily_menu)
+            plan.add_day(f"day_{day}", self.build_day_menu(date_str, meals))
+
+        # Plan structure with each recipe converted once and shared by its days
+        # (recipe_collection included)
+        monthly_plan = plan.to_legacy()
 
         # Generate weekly shopping lists
         weeks = self.organize_days_into_weeks(days_in_month)
@@ -399,9 +597,6 @@ class MealPlanningAgent:
             prep_guide = self.generate_prep_guide(monthly_plan, week_num, menu_type)
             monthly_plan["weekly_prep_guides"][f"week_{week_num}"] = asdict(prep_guide)
 
-        # Compile recipe collection
-        monthly_plan["recipe_collection"] = self.compile_recipe_collection(monthly_plan)
-
         # Generate month summary
         monthly_plan["month_summary"] = self.generate_month_summary(monthly_plan)
 
@@ -409,46 +604,62 @@ class MealPlanningAgent:
 
     def generate_daily_menu(self, menu_type: str, date_str: str, day_number: int) -> DayMenu:
         """Generate a single day's menu"""
-        template = self.menu_templates[menu_type]
-        recipes = self.recipe_database[menu_type]
+        meals = self.select_meals(menu_type, [day_number])[0]
+        return self.build_day_menu(date_str, meals)
 
-        # Select recipes based on menu type logic
-        if menu_type == "mediterranean":
-            breakfast = random.choice(recipes["breakfast"])
-            lunch = random.choice(recipes["lunch"])
-            dinner = random.choice(recipes["dinner"])
-            morning_snack = random.choice(recipes["snacks"])
-            afternoon_snack = random.choice(recipes["snacks"])
+    def meal_layout(self, menu_type: str, day_number: int) -> Dict[str, List[Recipe]]:
+        """Candidate recipes for each meal slot the day serves"""
+        recipes = self.recipe_database
 
-        elif menu_type == "intermittent_fasting":
+        if menu_type == "intermittent_fasting":
             # Determine which phase this day falls into
             phase = self.get_if_phase(day_number)
+            break_fasts = recipes.by_category(menu_type, "break_fast")
+            main_meals = recipes.by_category(menu_type, "main_meal")
+            snacks = recipes.by_category(menu_type, "snacks") or break_fasts[:1]
 
             if phase in ["phase_1", "phase_2"]:
                 # Earlier phases have more meals
-                breakfast = random.choice(recipes["break_fast"])
-                lunch = random.choice(recipes["main_meal"])
-                dinner = random.choice(recipes["main_meal"])
-                morning_snack = random.choice(recipes.get("snacks", [recipes["break_fast"][0]]))
-                afternoon_snack = None
+                layout = {"breakfast": break_fasts, "morning_snack": snacks, "lunch": main_meals, "dinner": main_meals}
             else:
                 # Later phases have fewer meals
-                breakfast = random.choice(recipes["break_fast"])
-                lunch = None
-                dinner = random.choice(recipes["main_meal"])
-                morning_snack = None
-                afternoon_snack = random.choice(recipes.get("snacks", [recipes["break_fast"][0]]))
+                layout = {"breakfast": break_fasts, "afternoon_snack": snacks, "dinner": main_meals}
+        else:
+            snacks = recipes.by_category(menu_type, "snacks")
+            layout = {
+                "breakfast": recipes.by_category(menu_type, "breakfast"),
+                "morning_snack": snacks,
+                "lunch": recipes.by_category(menu_type, "lunch"),
+                "afternoon_snack": snacks,
+                "dinner": recipes.by_category(menu_type, "dinner")
+            }
+
+        missing = [slot for slot, candidates in layout.items() if not candidates]
+        if missing:
+            raise ValueError(f"No {menu_type} recipes for {', '.join(missing)}")
+        return layout
+
+    def select_meals(self, menu_type: str, day_numbers: List[int]) -> List[Dict[str, Recipe]]:
+        """Choose the meals of the given days together, against the menu template's constraints"""
+        optimizer = MenuOptimizer(
+            MenuConstraints.for_menu(self.menu_templates[menu_type], self.nutrition_targets.get(menu_type)),
+            seed=random.getrandbits(32)  # follows random.seed(), like the selection it replaces
+        )
+        meals = optimizer.optimize([self.meal_layout(menu_type, day) for day in day_numbers])
+        self.last_selection_report = optimizer.last_report
+        return meals
 
+    def build_day_menu(self, date_str: str, meals: Dict[str, Recipe]) -> DayMenu:
         # Generate prep notes
-        prep_notes = self.generate_daily_prep_notes(breakfast, lunch, dinner)
+        prep_notes = self.generate_daily_prep_notes(meals["breakfast"], meals.get("lunch"), meals["dinner"])
 
         return DayMenu(
             date=date_str,
-            breakfast=breakfast,
-            morning_snack=morning_snack,
-            lunch=lunch,
-            afternoon_snack=afternoon_snack,
-            dinner=dinner,
+            breakfast=meals["breakfast"],
+            morning_snack=meals.get("morning_snack"),
+            lunch=meals.get("lunch"),
+            afternoon_snack=meals.get("afternoon_snack"),
+            dinner=meals["dinner"],
             prep_notes=prep_notes
         )
 
@@ -468,10 +679,10 @@ class MealPlanningAgent:
         notes = []
 
         # Check if any recipes require advance prep
-        if breakfast.prep_time and "overnight" in breakfast.prep_time.lower():
+        if breakfast.prep_overnight:
             notes.append(f"Prepare {breakfast.name} the night before")
 
-        if lunch and lunch.cook_time and int(lunch.cook_time.split()[0]) > 30:
+        if lunch and lunch.cook_minutes > 30:
             notes.append(f"Start {lunch.name} early - requires {lunch.cook_time}")
 
         if dinner.difficulty == "hard":
@@ -657,10 +868,13 @@ class MealPlanningAgent:
             cook_minutes = self.extract_minutes_from_time(recipe.get("cook_time", "0 minutes"))
             total_prep_time += prep_minutes + cook_minutes
 
-        avg_daily_calories = sum(
-            day_menu.get("daily_calories", 0)
-            for day_menu in monthly_plan["daily_menus"].values()
-        ) / len(monthly_plan["daily_menus"])
+        # Daily, weekly and monthly nutrition as array reductions
+        nutrition = PlanNutrition.from_day_menus(monthly_plan["daily_menus"])
+        menu_type = monthly_plan["meta"]["menu_type"]
+        targets = NutritionTargets.for_menu(
+            self.menu_templates.get(menu_type, {}), self.nutrition_targets.get(menu_type)
+        )
+        avg_daily_calories = nutrition.daily_averages()[CALORIES]
 
         return {
             "total_unique_recipes": total_recipes,
@@ -668,25 +882,13 @@ class MealPlanningAgent:
             "estimated_monthly_prep_time": f"{total_prep_time // 60} hours {total_prep_time % 60} minutes",
             "average_daily_calories": int(avg_daily_calories),
             "weekly_shopping_trips": len(monthly_plan["weekly_shopping_lists"]),
-            "meal_variety_score": total_recipes / len(monthly_plan["daily_menus"])  # recipes per day
+            "meal_variety_score": total_recipes / len(monthly_plan["daily_menus"]),  # recipes per day
+            "nutrition": nutrition.summary(targets)
         }
 
     def extract_minutes_from_time(self, time_str: str) -> int:
         """Extract minutes from time strings like '30 minutes' or '1 hour'"""
-        if not time_str:
-            return 0
-
-        time_str = time_str.lower()
-        minutes = 0
-
-        if "hour" in time_str:
-            hours = int(time_str.split()[0]) if time_str.split()[0].isdigit() else 1
-            minutes += hours * 60
-        elif "minute" in time_str:
-            mins = int(time_str.split()[0]) if time_str.split()[0].isdigit() else 0
-            minutes += mins
-
-        return minutes
+        return parse_minutes(time_str)
 
     def save_monthly_plan(self, monthly_plan: Dict, filename: str = None) -> str:
         """Save monthly plan to JSON file"""
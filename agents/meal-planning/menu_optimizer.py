@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Menu Optimizer
+Fills a month of meal slots against a menu template's constraints (daily
+calorie and protein ranges, meal calorie distribution, weekly fish meals,
+cuisine variety) plus a no-repeat window, by vectorized local search
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from nutrition_engine import (
+    CALORIES, DAY_SLOTS, NUTRIENTS, PROTEIN, NutritionTargets, range_deviation, recipe_matrix, recipe_nutrients
+)
+from recipe_library import mentions
+
+FISH_TERMS = (
+    "fish", "salmon", "tuna", "cod", "halibut", "trout", "sardine", "anchovy", "mackerel", "tilapia",
+    "sea bass", "branzino", "snapper", "swordfish", "shrimp", "prawn", "seafood"
+)
+
+# Penalty weights, in calorie equivalents
+CALORIE_WEIGHT = 1.0  # per kcal outside the daily range
+PROTEIN_WEIGHT = 4.0  # per gram outside the daily protein range
+SHARE_WEIGHT = 300.0  # per unit of summed |slot share - target share| in a day
+FISH_WEIGHT = 80.0  # per fish meal missing from a week
+CUISINE_WEIGHT = 40.0  # per listed cuisine missing from a week
+REPEAT_WEIGHT = 400.0  # per repeat of a recipe inside the no-repeat window
+TIE_NOISE = 1e-3  # random tie-breaking, so equally good months still vary
+
+
+def is_fish(recipe) -> bool:
+    ingredients = " ".join(str(item) for item in recipe.ingredients)
+    text = f"{recipe.name} {ingredients}".lower()
+    return any(mentions(text, term) for term in FISH_TERMS)
+
+
+@dataclass
+class MenuConstraints:
+    """What a month of menus should satisfy, from a menu template"""
+    targets: NutritionTargets = field(default_factory=NutritionTargets)
+    meal_distribution: Dict[str, float] = field(default_factory=dict)  # share of daily calories per slot
+    weekly_fish_meals: int = 0
+    cuisine_variety: List[str] = field(default_factory=list)  # cuisines each week should cover
+    no_repeat_days: int = 3  # a recipe is not served again within this many days
+
+    @classmethod
+    def for_menu(cls, template: Dict, nutrition_targets: Dict = None, no_repeat_days: int = 3) -> "MenuConstraints":
+        return cls(
+            targets=NutritionTargets.for_menu(template, nutrition_targets),
+            meal_distribution=dict(template.get("meal_distribution", {})),
+            weekly_fish_meals=template.get("weekly_fish_meals", 0),
+            cuisine_variety=list(template.get("cuisine_variety", [])),
+            no_repeat_days=no_repeat_days
+        )
+
+
+class MenuOptimizer:
+    """Local search over whole months of meal slots
+
+    Starts from a random fill, then sweeps the slots in random order, moving
+    each to the candidate with the lowest penalty given the rest of the
+    month, until a sweep changes nothing (or `max_sweeps`). Each move scores
+    every candidate for its slot at once with NumPy. Constraints are soft
+    penalties, so small recipe pools still produce a (best possible) month.
+    """
+
+    def __init__(self, constraints: MenuConstraints, max_sweeps: int = 8, seed: int = None):
+        self.constraints = constraints
+        self.max_sweeps = max_sweeps
+        self.rng = np.random.default_rng(seed)
+        self.last_report: Dict = {}
+
+    def optimize(self, day_pools: List[Dict[str, List]]) -> List[Dict[str, object]]:
+        """Pick one recipe per slot and day
+
+        `day_pools` holds, per day, the candidate recipes of each slot the
+        day serves. Returns the chosen recipe per slot for each day.
+        """
+        started = time.perf_counter()
+        constraints = self.constraints
+
+        # Shared recipe table and per-cell candidate indices
+        recipes: List = []
+        index_of: Dict[int, int] = {}
+        slots = [slot for slot in DAY_SLOTS if any(slot in pools for pools in day_pools)]
+        slots += [slot for pools in day_pools for slot in pools if slot not in slots]
+        cells: Dict[tuple, np.ndarray] = {}
+        for day, pools in enumerate(day_pools):
+            for slot, candidates in pools.items():
+                if not candidates:
+                    continue
+                indices = []
+                for recipe in candidates:
+                    if id(recipe) not in index_of:
+                        index_of[id(recipe)] = len(recipes)
+                        recipes.append(recipe)
+                    indices.append(index_of[id(recipe)])
+                cells[(day, slots.index(slot))] = np.unique(np.array(indices))
+
+        days, slot_count = len(day_pools), len(slots)
+        selection = np.full((days, slot_count), -1)
+        if not cells:
+            self.last_report = {}
+            return [{} for _ in day_pools]
+
+        nutrients = recipe_matrix(recipes)
+        calories, protein = nutrients[:, CALORIES], nutrients[:, PROTEIN]
+        fish = np.array([is_fish(recipe) for recipe in recipes], dtype=float)
+        listed = {cuisine.lower(): index for index, cuisine in enumerate(constraints.cuisine_variety)}
+        cuisine = np.array([listed.get((recipe.cuisine or "").lower(), -1) for recipe in recipes])
+        bounds = constraints.targets.bounds()
+
+        # Target calorie share of each slot, renormalized over the slots each day serves
+        shares = np.array([constraints.meal_distribution.get(slot, 0.0) for slot in slots])
+        day_shares = np.zeros((days, slot_count))
+        for (day, slot), _ in cells.items():
+            day_shares[day, slot] = shares[slot]
+        totals = day_shares.sum(axis=1, keepdims=True)
+        day_shares = np.divide(day_shares, totals, out=np.zeros_like(day_shares), where=totals > 0)
+        use_shares = bool(constraints.meal_distribution)
+
+        for (day, slot), pool in cells.items():
+            selection[day, slot] = self.rng.choice(pool)
+
+        def slot_values(values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+            return np.where(rows >= 0, values[np.maximum(rows, 0)], 0.0)
+
+        def move(day: int, slot: int, pool: np.ndarray) -> bool:
+            current = selection[day, slot]
+            row = selection[day].copy()
+            row[slot] = -1
+
+            others = slot_values(calories, row)
+            new_calories = others.sum() + calories[pool]
+            new_protein = slot_values(protein, row).sum() + protein[pool]
+            cost = (
+                CALORIE_WEIGHT * range_deviation(new_calories, bounds[:, CALORIES])
+                + PROTEIN_WEIGHT * range_deviation(new_protein, bounds[:, PROTEIN])
+            )
+
+            if use_shares:
+                slot_calories = np.tile(others, (len(pool), 1))
+                slot_calories[:, slot] = calories[pool]
+                share = np.divide(
+                    slot_calories, new_calories[:, None],
+                    out=np.zeros_like(slot_calories), where=new_calories[:, None] > 0
+                )
+                cost += SHARE_WEIGHT * np.abs(share - day_shares[day]).sum(axis=1)
+
+            week = selection[day - day % 7:day - day % 7 + 7].copy()
+            week[day % 7, slot] = -1
+            if constraints.weekly_fish_meals:
+                week_fish = slot_values(fish, week).sum()
+                cost += FISH_WEIGHT * np.maximum(constraints.weekly_fish_meals - (week_fish + fish[pool]), 0)
+            if listed:
+                covered = np.zeros(len(listed) + 1, dtype=bool)  # last entry absorbs unlisted cuisines
+                covered[cuisine[week[week >= 0]]] = True
+                covered[-1] = True
+                cost -= CUISINE_WEIGHT * ~covered[cuisine[pool]]
+
+            window = constraints.no_repeat_days
+            if window:
+                first = max(0, day - window)
+                nearby = selection[first:day + window + 1].copy()
+                nearby[day - first, slot] = -1
+                counts = np.bincount(nearby[nearby >= 0], minlength=len(recipes))
+                cost += REPEAT_WEIGHT * counts[pool]
+
+            cost += self.rng.random(len(pool)) * TIE_NOISE
+            best = int(np.argmin(cost))
+            # Only clear improvements move, so sweeps settle instead of trading ties
+            if pool[best] == current or cost[best] > cost[np.searchsorted(pool, current)] - 2 * TIE_NOISE:
+                return False
+            selection[day, slot] = pool[best]
+            return True
+
+        keys = list(cells)
+        sweeps = 0
+        for sweeps in range(1, self.max_sweeps + 1):
+            changed = 0
+            for position in self.rng.permutation(len(keys)):
+                day, slot = keys[position]
+                changed += move(day, slot, cells[(day, slot)])
+            if not changed:
+                break
+
+        seconds = time.perf_counter() - started
+        month_meals = [
+            {slots[slot]: recipes[selection[day, slot]] for slot in range(slot_count) if selection[day, slot] >= 0}
+            for day in range(days)
+        ]
+        self.last_report = {
+            "method": "local_search",
+            "sweeps": sweeps,
+            "seconds": round(seconds, 4),
+            "candidate_recipes": len(recipes),
+            **evaluate_month(month_meals, constraints)
+        }
+        return month_meals
+
+
+def evaluate_month(month_meals: List[Dict[str, object]], constraints: MenuConstraints) -> Dict:
+    """How well a month of chosen meals (slot -> recipe per day) meets the constraints"""
+    bounds = constraints.targets.bounds()
+    daily = np.zeros((len(month_meals), len(NUTRIENTS)))
+    for day, meals in enumerate(month_meals):
+        for recipe in meals.values():
+            daily[day] += recipe_nutrients(recipe)
+    deviation = range_deviation(daily, bounds)
+    calories_ok, protein_ok = deviation[:, CALORIES] == 0, deviation[:, PROTEIN] == 0
+
+    window = constraints.no_repeat_days
+    repeats = 0
+    for day, meals in enumerate(month_meals):
+        recent = [id(recipe) for earlier in month_meals[max(0, day - window):day] for recipe in earlier.values()]
+        today = [id(recipe) for recipe in meals.values()]
+        repeats += sum(recipe in recent for recipe in today) + len(today) - len(set(today))
+
+    weeks = [month_meals[start:start + 7] for start in range(0, len(month_meals), 7)]
+    listed = {cuisine.lower() for cuisine in constraints.cuisine_variety}
+    return {
+        "days_on_target": int((calories_ok & protein_ok).sum()),
+        "days_in_calorie_range": int(calories_ok.sum()),
+        "days_in_protein_range": int(protein_ok.sum()),
+        "repeats_in_window": repeats,
+        "weekly_fish_meals": [sum(is_fish(recipe) for meals in week for recipe in meals.values()) for week in weeks],
+        "weekly_cuisines": [
+            len({recipe.cuisine.lower() for meals in week for recipe in meals.values()} & listed) for week in weeks
+        ]
+    }
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Nutrition Engine
+Lays plans out as days x meal slots x nutrients arrays, so daily, weekly and
+monthly totals, averages and target deviations are vectorized reductions,
+and thousands of candidate plans can be scored at once
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+CALORIES, PROTEIN, CARBS, FAT = range(len(NUTRIENTS))
+
+DAY_SLOTS = ("breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner")
+
+# Dict recipes use either the plan keys or the AI generator's per-serving keys
+_NUTRIENT_KEYS = {
+    "calories": ("calories", "calories_per_serving"),
+    "protein": ("protein", "protein_per_serving"),
+    "carbs": ("carbs", "carbs_per_serving"),
+    "fat": ("fat", "fat_per_serving")
+}
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _grams(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value or ""))
+    return float(match.group()) if match else 0.0
+
+
+def recipe_nutrients(recipe) -> np.ndarray:
+    """(calories, protein, carbs, fat) of a Recipe or a recipe dict"""
+    if recipe is None:
+        return np.zeros(len(NUTRIENTS))
+    if not isinstance(recipe, dict):
+        return np.array([recipe.calories, recipe.protein_g, recipe.carbs_g, recipe.fat_g], dtype=float)
+
+    values = []
+    for nutrient in NUTRIENTS:
+        key = next((key for key in _NUTRIENT_KEYS[nutrient] if key in recipe), None)
+        values.append(_grams(recipe[key]) if key else 0.0)
+    return np.array(values)
+
+
+def recipe_matrix(recipes: Sequence) -> np.ndarray:
+    """Recipes x nutrients matrix, for scoring plans given as recipe indices"""
+    matrix = np.zeros((len(recipes), len(NUTRIENTS)))
+    for index, recipe in enumerate(recipes):
+        matrix[index] = recipe_nutrients(recipe)
+    return matrix
+
+
+@dataclass
+class NutritionTargets:
+    """Daily target ranges; None leaves that side of a range open"""
+    calories_min: Optional[float] = None
+    calories_max: Optional[float] = None
+    protein_min: Optional[float] = None
+    protein_max: Optional[float] = None
+
+    @classmethod
+    def for_menu(cls, template: Dict, nutrition_targets: Dict = None) -> "NutritionTargets":
+        """Targets from a menu template's ranges, else its nutrition target point values"""
+        nutrition_targets = nutrition_targets or {}
+        calories = template.get("daily_calories", {})
+        protein = template.get("daily_protein", {})
+
+        calorie_point = nutrition_targets.get("calories_per_day")
+        protein_point = _grams(nutrition_targets["protein_per_day"]) if "protein_per_day" in nutrition_targets else None
+        return cls(
+            calories_min=calories.get("min", calorie_point),
+            calories_max=calories.get("max", calorie_point),
+            protein_min=protein.get("min", protein_point),
+            protein_max=protein.get("max", protein_point)
+        )
+
+    def bounds(self) -> np.ndarray:
+        """2 x nutrients array of (lower, upper) daily bounds, +-inf where open"""
+        lower = np.full(len(NUTRIENTS), -np.inf)
+        upper = np.full(len(NUTRIENTS), np.inf)
+        for index, low, high in (
+            (CALORIES, self.calories_min, self.calories_max),
+            (PROTEIN, self.protein_min, self.protein_max)
+        ):
+            if low is not None:
+                lower[index] = low
+            if high is not None:
+                upper[index] = high
+        return np.stack([lower, upper])
+
+    @property
+    def defined(self) -> bool:
+        return any(value is not None for value in (
+            self.calories_min, self.calories_max, self.protein_min, self.protein_max
+        ))
+
+
+def range_deviation(values: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """How far each value lies outside its [lower, upper] bound (0 inside), elementwise"""
+    return np.maximum(bounds[0] - values, 0) + np.maximum(values - bounds[1], 0)
+
+
+class PlanNutrition:
+    """Nutrients of one plan as a days x slots x nutrients array
+
+    Empty slots hold zeros, so sums over slots are day totals directly.
+    `weeks` labels the week of each day; by default days are grouped into
+    consecutive weeks of seven, as plans organize them.
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        day_keys: List[str],
+        slots: Sequence[str],
+        weeks: List[str] = None
+    ):
+        self.values = values
+        self.day_keys = day_keys
+        self.slots = tuple(slots)
+        self.weeks = weeks or [f"week_{index // 7 + 1}" for index in range(len(day_keys))]
+
+    @classmethod
+    def from_day_menus(
+        cls,
+        daily_menus: Dict[str, Dict],
+        slots: Sequence[str] = DAY_SLOTS,
+        weeks: List[str] = None
+    ) -> "PlanNutrition":
+        """From a plan's daily_menus (day key -> day dict, or DayMenu)"""
+        values = np.zeros((len(daily_menus), len(slots), len(NUTRIENTS)))
+        for day_index, day_menu in enumerate(daily_menus.values()):
+            for slot_index, slot in enumerate(slots):
+                recipe = day_menu.get(slot) if isinstance(day_menu, dict) else getattr(day_menu, slot, None)
+                if recipe:
+                    values[day_index, slot_index] = recipe_nutrients(recipe)
+        return cls(values, list(daily_menus), slots, weeks)
+
+    @classmethod
+    def from_weeks(cls, weeks: Dict[str, Dict]) -> "PlanNutrition":
+        """From the AI generator's weeks -> days -> meals layout (slots are meal categories)"""
+        days = [
+            (week_key, f"{week_key}/{day_key}", day_data["meals"])
+            for week_key, week_data in weeks.items()
+            for day_key, day_data in week_data["days"].items()
+        ]
+        slots = list(dict.fromkeys(slot for _, _, meals in days for slot in meals))
+        return cls.from_day_menus({key: meals for _, key, meals in days}, slots, [week for week, _, _ in days])
+
+    @property
+    def days(self) -> int:
+        return self.values.shape[0]
+
+    def daily_totals(self) -> np.ndarray:
+        """days x nutrients"""
+        return self.values.sum(axis=1)
+
+    def weekly_totals(self) -> Tuple[List[str], np.ndarray]:
+        """Week labels and the matching weeks x nutrients totals"""
+        labels = list(dict.fromkeys(self.weeks))
+        position = {label: index for index, label in enumerate(labels)}
+        week_of_day = np.array([position[week] for week in self.weeks], dtype=int)
+
+        totals = np.zeros((len(labels), len(NUTRIENTS)))
+        np.add.at(totals, week_of_day, self.daily_totals())
+        return labels, totals
+
+    def monthly_totals(self) -> np.ndarray:
+        return self.values.sum(axis=(0, 1))
+
+    def daily_averages(self) -> np.ndarray:
+        return self.daily_totals().mean(axis=0) if self.days else np.zeros(len(NUTRIENTS))
+
+    def slot_shares(self) -> np.ndarray:
+        """slots: each slot's share of the plan's calories"""
+        per_slot = self.values[:, :, CALORIES].sum(axis=0)
+        total = per_slot.sum()
+        return per_slot / total if total else per_slot
+
+    def summary(self, targets: NutritionTargets = None) -> Dict:
+        """Plan-level nutrition for month summaries"""
+        daily = self.daily_totals()
+        week_labels, weekly = self.weekly_totals()
+        summary = {
+            "daily_average": _rounded(self.daily_averages()),
+            "monthly_total": _rounded(self.monthly_totals()),
+            "weekly_totals": {label: _rounded(week) for label, week in zip(week_labels, weekly)},
+            "meal_calorie_shares": {
+                slot: round(float(share), 3) for slot, share in zip(self.slots, self.slot_shares())
+            }
+        }
+
+        if targets is not None and targets.defined and self.days:
+            bounds = targets.bounds()
+            deviation = range_deviation(daily, bounds)
+            tracked = np.isfinite(bounds).any(axis=0)
+            summary["target_deviation"] = {
+                nutrient: {
+                    "days_in_range": int((deviation[:, index] == 0).sum()),
+                    "average_daily_deviation": round(float(deviation[:, index].mean()), 1),
+                    "worst_day": self.day_keys[int(deviation[:, index].argmax())]
+                    if deviation[:, index].any() else None
+                }
+                for index, nutrient in enumerate(NUTRIENTS) if tracked[index]
+            }
+        return summary
+
+
+def _rounded(values: np.ndarray) -> Dict[str, int]:
+    return {nutrient: int(round(float(value))) for nutrient, value in zip(NUTRIENTS, values)}
+
+
+def evaluate_plans(
+    selections: np.ndarray,
+    nutrients: np.ndarray,
+    targets: NutritionTargets,
+    slot_shares: Sequence[float] = None
+) -> Dict[str, np.ndarray]:
+    """Score many candidate plans at once
+
+    `selections` is plans x days x slots of row indices into `nutrients`
+    (see recipe_matrix), with -1 for an empty slot. Returns per-plan arrays:
+    daily average nutrients, days with calories and protein in range, mean
+    daily deviation outside the target ranges, and (with `slot_shares`) the
+    mean absolute gap to the intended calorie share of each slot.
+    """
+    selections = np.asarray(selections)
+    filled = selections >= 0
+    values = nutrients[np.where(filled, selections, 0)] * filled[..., None]  # plans x days x slots x nutrients
+
+    daily = values.sum(axis=2)  # plans x days x nutrients
+    deviation = range_deviation(daily, targets.bounds())
+    scores = {
+        "daily_average": daily.mean(axis=1),
+        "days_in_range": (deviation[..., [CALORIES, PROTEIN]] == 0).all(axis=2).sum(axis=1),
+        "deviation": deviation[..., [CALORIES, PROTEIN]].sum(axis=2).mean(axis=1)
+    }
+
+    if slot_shares is not None:
+        day_calories = daily[..., CALORIES:CALORIES + 1]
+        shares = np.divide(
+            values[..., CALORIES], day_calories, out=np.zeros(values.shape[:3]), where=day_calories > 0
+        )
+        scores["share_gap"] = np.abs(shares - np.asarray(slot_shares)).mean(axis=(1, 2))
+    return scores
+
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Plan Budget
+Wall-clock deadline for generating one plan, used to decide when AI recipes
+no longer fit and template recipes should be used instead
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class PlanBudget:
+    """Deadline for one plan plus a running estimate of AI recipe latency
+
+    The estimate is an exponentially weighted moving average of completed
+    AI calls (`alpha` weights the newest sample). A new AI call is only
+    worth starting while the expected latency still fits in the remaining
+    budget; calls that do start are cut off at the deadline. Without an
+    initial estimate, calls start freely until the first one completes.
+    """
+
+    def __init__(self, seconds: float, initial_estimate: Optional[float] = None, alpha: float = 0.2):
+        self.seconds = seconds
+        self.expected_latency = initial_estimate
+        self.alpha = alpha
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+
+        self.ai_calls = 0
+        self.degraded_meals = 0
+        self.degraded_days: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def should_degrade(self) -> bool:
+        """True when an AI call started now is not expected to finish in time"""
+        if self.expected_latency is None:
+            return self.remaining() <= 0
+        return self.remaining() < self.expected_latency
+
+    def record(self, latency: float):
+        """Fold a completed AI call's latency into the estimate"""
+        with self._lock:
+            self.ai_calls += 1
+            if self.expected_latency is None:
+                self.expected_latency = latency
+            else:
+                self.expected_latency += self.alpha * (latency - self.expected_latency)
+
+    def mark_degraded(self, day: int):
+        """Count a meal on `day` that got a template because of the budget"""
+        with self._lock:
+            self.degraded_meals += 1
+            self.degraded_days[day] = self.degraded_days.get(day, 0) + 1
+
+    def report(self) -> Dict:
+        elapsed = self.elapsed()
+        degraded_days: List[int] = sorted(self.degraded_days)
+        return {
+            "budget_seconds": self.seconds,
+            "elapsed_seconds": round(elapsed, 2),
+            "budget_used": f"{min(elapsed / self.seconds, 9.99) * 100:.1f}%" if self.seconds > 0 else "100%",
+            "expected_recipe_latency": round(self.expected_latency or 0.0, 2),
+            "ai_calls": self.ai_calls,
+            "degraded_meals": self.degraded_meals,
+            "degraded_days": degraded_days
+        }
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Plan Journal
+Durable JSONL checkpoints for long-running plan generation, so a crashed or
+interrupted run can resume without paying for completed recipes again
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+JOURNAL_VERSION = 1
+
+
+class PlanJournal:
+    """Append-only checkpoint journal for one plan generation run
+
+    The first line is a header holding the generation parameters; each
+    completed meal and day is appended as its own line and fsynced, so at
+    most the entry being written when the process died is lost. Reopening
+    an existing journal replays it; a torn final line is ignored.
+    """
+
+    def __init__(self, path: str, params: Dict = None):
+        self.path = path
+        self.params: Dict = {}
+        self.meals: Dict[str, Dict] = {}
+        self.days: Dict[str, Dict] = {}
+        self.completed = False
+        self._torn_tail = False
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            self._load()
+            if params is not None and self._canonical(params) != self._canonical(self.params):
+                raise ValueError(f"Journal {path} was written for different parameters: {self.params}")
+            logging.info(f"Resuming from journal {path}: {len(self.days)} days, {len(self.meals)} meals done")
+        else:
+            if params is None:
+                raise FileNotFoundError(f"No plan journal at {path}")
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.params = params
+            self._append({
+                "type": "header",
+                "version": JOURNAL_VERSION,
+                "params": params,
+                "started_at": datetime.now().isoformat()
+            })
+
+    @staticmethod
+    def _canonical(params: Dict) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            line = ""
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping unreadable line {line_number} in journal {self.path}")
+                    continue
+
+                kind = entry.get("type")
+                if kind == "header":
+                    if entry.get("version") != JOURNAL_VERSION:
+                        raise ValueError(f"Unsupported journal version in {self.path}")
+                    self.params = entry["params"]
+                elif kind == "meal":
+                    self.meals[entry["key"]] = entry["recipe"]
+                elif kind == "day":
+                    self.days[entry["key"]] = entry["data"]
+                elif kind == "complete":
+                    self.completed = True
+
+            # A write cut off mid-line; start the next entry on a fresh line
+            self._torn_tail = bool(line) and not line.endswith("\n")
+
+    def _append(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._torn_tail:
+                line = "\n" + line
+                self._torn_tail = False
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def meal(self, key: str) -> Optional[Dict]:
+        return self.meals.get(key)
+
+    def day(self, key: str) -> Optional[Dict]:
+        return self.days.get(key)
+
+    def record_meal(self, key: str, recipe: Dict):
+        self._append({"type": "meal", "key": key, "recipe": recipe})
+        self.meals[key] = recipe
+
+    def record_day(self, key: str, data: Any):
+        self._append({"type": "day", "key": key, "data": data})
+        self.days[key] = data
+
+    def mark_complete(self):
+        self._append({"type": "complete", "completed_at": datetime.now().isoformat()})
+        self.completed = True
+
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Plan Model
+Monthly plans where days reference recipes by id in one shared recipe
+table instead of embedding a deep copy of each recipe in every day. The
+legacy nested dict is materialized once, for the API and plan files
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from meal_planning_agent import DayMenu, Recipe
+
+DAY_SLOTS = ("breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner")
+
+# Slot order the recipe collection is compiled in
+COLLECTION_SLOTS = ("breakfast", "lunch", "dinner", "morning_snack", "afternoon_snack")
+
+
+@dataclass
+class DayPlan:
+    """One day of a plan: recipe ids per meal slot plus the day's totals"""
+    date: str
+    meals: Dict[str, Optional[str]]
+    daily_calories: int = 0
+    daily_protein: str = "0g"
+    prep_notes: List[str] = field(default_factory=list)
+    extras: Dict[str, Any] = field(default_factory=dict)  # extra legacy keys, e.g. recipe_sources
+
+
+class MonthlyPlan:
+    """A monthly plan holding each recipe once, however many days use it
+
+    Recipes are keyed by id; two different recipes with the same id (e.g.
+    AI recipes without stable ids) get distinct table keys so neither is
+    lost.
+    """
+
+    def __init__(self, meta: Dict):
+        self.meta = meta
+        self.recipes: Dict[str, "Recipe"] = {}
+        self.days: Dict[str, DayPlan] = {}
+
+    def add_recipe(self, recipe: "Recipe") -> str:
+        """Table key for `recipe`, adding it if the table does not hold it yet"""
+        key = recipe.id or recipe.name
+        suffix = 1
+        while key in self.recipes and self.recipes[key] is not recipe and self.recipes[key] != recipe:
+            suffix += 1
+            key = f"{recipe.id or recipe.name}#{suffix}"
+        self.recipes.setdefault(key, recipe)
+        return key
+
+    def add_day(self, day_key: str, day_menu: "DayMenu", **extras) -> DayPlan:
+        meals = {}
+        for slot in DAY_SLOTS:
+            recipe = getattr(day_menu, slot)
+            meals[slot] = self.add_recipe(recipe) if recipe is not None else None
+
+        day = DayPlan(
+            date=day_menu.date,
+            meals=meals,
+            daily_calories=day_menu.daily_calories,
+            daily_protein=day_menu.daily_protein,
+            prep_notes=list(day_menu.prep_notes),
+            extras=extras
+        )
+        self.days[day_key] = day
+        return day
+
+    def meal(self, day_key: str, slot: str) -> Optional["Recipe"]:
+        recipe_key = self.days[day_key].meals.get(slot)
+        return self.recipes[recipe_key] if recipe_key else None
+
+    def meals(self, day_keys: List[str] = None) -> Iterator[Tuple[str, str, "Recipe"]]:
+        """(day key, slot, recipe) for every filled slot of the given days (default all)"""
+        for day_key in (self.days if day_keys is None else day_keys):
+            for slot, recipe_key in self.days[day_key].meals.items():
+                if recipe_key:
+                    yield day_key, slot, self.recipes[recipe_key]
+
+    def to_legacy(self) -> Dict:
+        """The nested plan dict the API and plan files use
+
+        Each recipe is converted once; every day using it and the recipe
+        collection share that one dict, so treat recipe dicts as read-only.
+        The collection is keyed by recipe table key: the recipe id, with a
+        `#n` suffix for a different recipe reusing an id.
+        The weekly sections and month summary start empty for the caller to
+        fill in.
+        """
+        recipe_dicts: Dict[str, Dict] = {}
+
+        def recipe_dict(recipe_key: Optional[str]) -> Optional[Dict]:
+            if recipe_key is None:
+                return None
+            if recipe_key not in recipe_dicts:
+                recipe_dicts[recipe_key] = self.recipes[recipe_key].to_dict()
+            return recipe_dicts[recipe_key]
+
+        daily_menus = {}
+        for day_key, day in self.days.items():
+            daily_menus[day_key] = {
+                "date": day.date,
+                **{slot: recipe_dict(day.meals.get(slot)) for slot in DAY_SLOTS},
+                "daily_calories": day.daily_calories,
+                "daily_protein": day.daily_protein,
+                "prep_notes": day.prep_notes,
+                **day.extras
+            }
+
+        # Keyed like the recipe table, so recipes sharing an id are all kept
+        recipe_collection = {}
+        for day in self.days.values():
+            for slot in COLLECTION_SLOTS:
+                recipe_key = day.meals.get(slot)
+                if recipe_key and self.recipes[recipe_key].id:
+                    recipe_collection[recipe_key] = recipe_dict(recipe_key)
+
+        return {
+            "meta": self.meta,
+            "daily_menus": daily_menus,
+            "weekly_shopping_lists": {},
+            "weekly_prep_guides": {},
+            "recipe_collection": recipe_collection,
+            "month_summary": {}
+        }
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Prompt Assembly
+Static per-menu-type prompt prefixes built once, plus small per-request suffixes
+"""
+
+import json
+from typing import Dict, List, Tuple
+
+# Fraction of the normal input price billed for prompt-cache reads (Anthropic)
+CACHE_READ_COST_FACTOR = 0.1
+
+# Providers only cache prefixes at least this long (Claude Sonnet, OpenAI)
+MIN_CACHEABLE_TOKENS = 1024
+
+RECIPE_SCHEMA = """{
+  "name": "Recipe Name",
+  "description": "Brief description",
+  "prep_time": "X minutes",
+  "cook_time": "Y minutes",
+  "servings": number,
+  "calories_per_serving": number,
+  "protein_per_serving": "Xg",
+  "carbs_per_serving": "Xg",
+  "fat_per_serving": "Xg",
+  "ingredients": [{"item": "ingredient", "amount": "X", "unit": "cups/tbsp/etc"}],
+  "instructions": ["Step 1...", "Step 2..."],
+  "tips": ["Optional cooking tips"],
+  "tags": ["tag1", "tag2"]
+}"""
+
+RULES = """REQUIREMENTS:
+1. Recipe must be authentic to the requested cuisine style
+2. Use seasonal ingredients for the requested season when possible
+3. Meet the exact calorie (±20) and minimum protein targets
+4. Include prep and cook times within the requested maximum
+5. List all ingredients with exact measurements
+6. Provide clear step-by-step instructions
+7. Respect every dietary restriction and use only the listed equipment"""
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+class PromptBuilder:
+    """Renders recipe prompts as a static, cacheable prefix plus a variable suffix
+
+    The prefix (role, cuisine guidelines, JSON schema, rules) depends only on
+    the menu type, so it is rendered once and sent as the system prompt. Each
+    request then only adds a few lines of per-recipe requirements. OpenAI
+    prefixes leave out the cuisine guidelines, as its original prompt did.
+
+    Providers only cache prefixes of at least MIN_CACHEABLE_TOKENS, which the
+    current prefixes (~370-430 tokens) fall short of, so `cacheable` is False
+    and prompt caching stays inactive until the prefixes grow.
+    """
+
+    def __init__(self, cuisine_knowledge: Dict[str, Dict]):
+        self.cuisine_knowledge = cuisine_knowledge
+        self._prefixes: Dict[Tuple, str] = {}
+
+        # Build the common prefixes once up front
+        for menu_type in cuisine_knowledge:
+            self.static_prefix(menu_type)
+            self.static_prefix(menu_type, guidelines=False)
+
+    def static_prefix(self, *menu_types: str, guidelines: bool = True) -> str:
+        """Prefix for one or more menu types, rendered on first use and reused"""
+        key = (tuple(sorted(set(menu_types))), guidelines)
+        if key not in self._prefixes:
+            self._prefixes[key] = self._render_prefix(*key)
+        return self._prefixes[key]
+
+    def provider_prefix(self, provider_name: str, *menu_types: str) -> str:
+        """Prefix in a provider's prompt style"""
+        return self.static_prefix(*menu_types, guidelines=provider_name != "openai")
+
+    @staticmethod
+    def cacheable(prefix: str) -> bool:
+        """Whether a prefix is long enough for providers to cache it"""
+        return approx_tokens(prefix) >= MIN_CACHEABLE_TOKENS
+
+    def _render_prefix(self, menu_types: Tuple[str, ...], guidelines: bool) -> str:
+        parts = ["You are an expert chef specializing in healthy, customized meal planning."]
+        if guidelines:
+            by_menu = {menu_type: self.cuisine_knowledge.get(menu_type, {}) for menu_type in menu_types}
+            parts.append(f"CUISINE GUIDELINES (by menu type):\n{json.dumps(by_menu, separators=(',', ':'))}")
+
+        return "\n\n".join(parts + [
+            RULES,
+            f"Respond with JSON only. A single recipe uses this structure:\n{RECIPE_SCHEMA}",
+            'When asked for several numbered slots, respond with {"recipes": [...]} '
+            'holding one recipe object per slot, each with an extra "slot" number, '
+            "and never repeat a dish across slots."
+        ])
+
+    def _requirement_line(self, req) -> str:
+        restrictions = ', '.join(req.dietary_restrictions) if req.dietary_restrictions else 'None'
+        return (
+            f"{req.cuisine_style} {req.meal_category} ({req.menu_type}) - "
+            f"{req.target_calories} calories, {req.target_protein}g protein minimum, "
+            f"max {req.prep_time_max} minutes prep, {req.difficulty_level} difficulty, "
+            f"serves {req.family_size}, {req.season} season, {req.budget_level} budget, "
+            f"restrictions: {restrictions}, equipment: {', '.join(req.equipment_available)}"
+        )
+
+    def recipe_suffix(self, req) -> str:
+        """Per-request part of a single-recipe prompt"""
+        return f"Create one recipe: {self._requirement_line(req)}"
+
+    def batch_suffix(self, requirements_list: List) -> str:
+        """Per-request part of a multi-slot prompt"""
+        lines = [f"Create {len(requirements_list)} distinct recipes, one per slot:"]
+        lines.extend(
+            f"SLOT {slot}: {self._requirement_line(req)}"
+            for slot, req in enumerate(requirements_list, start=1)
+        )
+        return "\n".join(lines)
+
+    def variants_suffix(self, req, count: int) -> str:
+        """Per-request part of a prompt for several distinct dishes meeting one brief"""
+        return (
+            f"Create {count} distinct recipes, one per slot (SLOT 1 to SLOT {count}), "
+            f"each a different dish for: {self._requirement_line(req)}"
+        )
+
+    def missing_fields_suffix(self, req, recipe: Dict, missing: List[str]) -> str:
+        """Short follow-up asking only for the fields a response left out"""
+        known = {key: value for key, value in recipe.items() if key in ("name", "ingredients")}
+        return (
+            f"This recipe for {self._requirement_line(req)} came back incomplete:\n"
+            f"{json.dumps(known, separators=(',', ':'))}\n"
+            f"Respond with a JSON object containing only these fields: {', '.join(missing)}"
+        )
+
+    def legacy_prompt(self, req, provider_name: str) -> str:
+        """The full inline prompt the provider was sent before the prefix split
+
+        Kept only as the baseline for `token_report`.
+        """
+        if provider_name == "openai":
+            return "You are an expert chef specializing in healthy, customized meal planning." + f"""
+        Generate a {req.cuisine_style} {req.meal_category} recipe with these specifications:
+        - Calories: {req.target_calories} (±20)
+        - Protein: {req.target_protein}g minimum
+        - Prep time: max {req.prep_time_max} minutes
+        - Serves: {req.family_size}
+        - Season: {req.season}
+        - Budget: {req.budget_level}
+        - Dietary restrictions: {req.dietary_restrictions}
+
+        Return as JSON with name, ingredients, instructions, and nutrition info.
+        """
+
+        return f"""
+        Create a detailed {req.cuisine_style} {req.meal_category} recipe that follows these exact requirements:
+
+        MENU TYPE: {req.menu_type}
+        TARGET CALORIES: {req.target_calories} calories (±20 calories)
+        TARGET PROTEIN: {req.target_protein}g protein minimum
+        PREP TIME: Maximum {req.prep_time_max} minutes
+        DIFFICULTY: {req.difficulty_level}
+        SERVES: {req.family_size} people
+        SEASON: {req.season} (use seasonal ingredients)
+        BUDGET: {req.budget_level}
+
+        DIETARY RESTRICTIONS: {', '.join(req.dietary_restrictions) if req.dietary_restrictions else 'None'}
+        AVAILABLE EQUIPMENT: {', '.join(req.equipment_available)}
+
+        CUISINE GUIDELINES:
+        {json.dumps(self.cuisine_knowledge.get(req.menu_type, {}), indent=2)}
+
+        REQUIREMENTS:
+        1. Recipe must be authentic to the {req.cuisine_style} style
+        2. Use seasonal {req.season} ingredients when possible
+        3. Meet the exact calorie and protein targets
+        4. Include prep and cook times
+        5. List all ingredients with exact measurements
+        6. Provide clear step-by-step instructions
+
+        Format the response as JSON with this structure:
+        {{
+            "name": "Recipe Name",
+            "description": "Brief description",
+            "prep_time": "X minutes",
+            "cook_time": "Y minutes",
+            "servings": {req.family_size},
+            "calories_per_serving": number,
+            "protein_per_serving": "Xg",
+            "ingredients": [
+                {{"item": "ingredient", "amount": "X", "unit": "cups/tbsp/etc"}},
+                ...
+            ],
+            "instructions": [
+                "Step 1...",
+                "Step 2...",
+                ...
+            ],
+            "tips": ["Optional cooking tips"],
+            "tags": ["tag1", "tag2"]
+        }}
+        """
+
+    def token_report(self, requirements, provider_name: str = "claude") -> Dict:
+        """Estimated input tokens per single-recipe call, before and after the split
+
+        `legacy` is the original inline prompt for the provider; `current` is
+        the prefix plus suffix sent now. `billed` prices prefix reads at the
+        cache rate only when the prefix is long enough to be cached, and
+        `caching` says whether it is.
+        """
+        prefix_tokens = approx_tokens(self.provider_prefix(provider_name, requirements.menu_type))
+        suffix_tokens = approx_tokens(self.recipe_suffix(requirements))
+        legacy_tokens = approx_tokens(self.legacy_prompt(requirements, provider_name))
+        current_tokens = prefix_tokens + suffix_tokens
+        cacheable = prefix_tokens >= MIN_CACHEABLE_TOKENS
+        billed_tokens = suffix_tokens + prefix_tokens * (CACHE_READ_COST_FACTOR if cacheable else 1)
+
+        return {
+            "menu_type": requirements.menu_type,
+            "provider": provider_name,
+            "prefix_tokens": prefix_tokens,
+            "suffix_tokens": suffix_tokens,
+            "caching": "active" if cacheable else f"inactive (prefix below {MIN_CACHEABLE_TOKENS} tokens)",
+            "legacy_tokens_per_call": legacy_tokens,
+            "current_tokens_per_call": current_tokens,
+            "billed_tokens_per_call": round(billed_tokens, 1),
+            "savings_per_call": round(legacy_tokens - billed_tokens, 1)
+        }
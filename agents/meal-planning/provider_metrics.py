@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Provider Metrics
+Process-wide latency histograms for AI providers and model routes
+"""
+
+import bisect
+import threading
+from typing import Dict, List
+
+# Bucket upper bounds in seconds: 50ms doubling-ish up to ~5 minutes
+LATENCY_BUCKETS: List[float] = [round(0.05 * (1.4 ** i), 3) for i in range(27)]
+
+
+class LatencyHistogram:
+    """Bucketed latency histogram with percentile estimates
+
+    Counts are halved once the total passes `decay_after` samples, so the
+    percentiles follow the provider's recent behavior instead of all-time.
+    """
+
+    def __init__(self, buckets: List[float] = None, decay_after: int = 1000):
+        self.buckets = buckets or LATENCY_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is overflow
+        self.decay_after = decay_after
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += 1
+
+            if self.total > self.decay_after:
+                self.counts = [count // 2 for count in self.counts]
+                self.total = sum(self.counts)
+
+    def percentile(self, quantile: float) -> float:
+        """Upper bound of the bucket holding the given quantile (0 when empty)"""
+        with self._lock:
+            if self.total == 0:
+                return 0.0
+
+            target = quantile * self.total
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return self.buckets[min(index, len(self.buckets) - 1)]
+            return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        return {
+            "samples": self.total,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99)
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(provider_name: str) -> LatencyHistogram:
+    """Process-wide latency histogram for a provider, created on first use"""
+    with _histograms_lock:
+        if provider_name not in _histograms:
+            _histograms[provider_name] = LatencyHistogram()
+        return _histograms[provider_name]
+
+
+def latency_snapshot() -> Dict[str, Dict]:
+    """Percentiles for every provider seen so far"""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+
+class RouteMetrics:
+    """Calls, latency and token usage for one model route"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, input_tokens: int, output_tokens: int):
+        self.latency.record(latency)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = self.calls
+            input_tokens = self.input_tokens
+            output_tokens = self.output_tokens
+        return {
+            "calls": calls,
+            "avg_input_tokens": round(input_tokens / calls) if calls else 0,
+            "avg_output_tokens": round(output_tokens / calls) if calls else 0,
+            "latency": self.latency.snapshot()
+        }
+
+
+_routes: Dict[str, RouteMetrics] = {}
+_routes_lock = threading.Lock()
+
+
+def record_route(route: str, latency: float, input_tokens: int, output_tokens: int):
+    """Record one completed call on a route such as "keto/snack -> claude-3-haiku" """
+    with _routes_lock:
+        if route not in _routes:
+            _routes[route] = RouteMetrics()
+        metrics = _routes[route]
+    metrics.record(latency, input_tokens, output_tokens)
+
+
+def route_snapshot() -> Dict[str, Dict]:
+    """Per-route call counts, token averages and latency percentiles"""
+    with _routes_lock:
+        routes = dict(_routes)
+    return {route: metrics.snapshot() for route, metrics in sorted(routes.items())}
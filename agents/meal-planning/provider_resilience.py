@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Provider Resilience
+Process-wide rate limiting and retry/backoff shared by every AI provider instance
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+
+@dataclass
+class ProviderLimits:
+    """Request/token budgets and concurrency cap for one provider"""
+    requests_per_minute: int
+    tokens_per_minute: int
+    max_concurrency: int
+
+
+# Conservative defaults; override per deployment with environment variables
+DEFAULT_LIMITS = {
+    "claude": ProviderLimits(requests_per_minute=50, tokens_per_minute=40000, max_concurrency=8),
+    "openai": ProviderLimits(requests_per_minute=500, tokens_per_minute=30000, max_concurrency=16),
+    # Offline stand-ins are unthrottled unless a benchmark sets FAKE_* / REPLAY_* limits
+    "fake": ProviderLimits(requests_per_minute=1000000, tokens_per_minute=1000000000, max_concurrency=1000),
+    "replay": ProviderLimits(requests_per_minute=1000000, tokens_per_minute=1000000000, max_concurrency=1000)
+}
+
+
+def limits_from_env(provider_name: str) -> ProviderLimits:
+    """Provider limits with <NAME>_RPM, <NAME>_TPM and <NAME>_MAX_CONCURRENCY overrides"""
+    default = DEFAULT_LIMITS.get(provider_name, ProviderLimits(60, 60000, 8))
+    prefix = provider_name.upper()
+    return ProviderLimits(
+        requests_per_minute=int(os.getenv(f"{prefix}_RPM", default.requests_per_minute)),
+        tokens_per_minute=int(os.getenv(f"{prefix}_TPM", default.tokens_per_minute)),
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", default.max_concurrency))
+    )
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations
+
+    Reservations may drive the bucket negative; the caller is told how long
+    to wait until its reservation is covered, so waiters are served in order.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return the seconds to wait before using them"""
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_second
+
+    def adjust(self, amount: float):
+        """Give back (positive) or charge extra (negative) tokens after the fact"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class ProviderRateLimiter:
+    """Request/token budgets and concurrency cap shared by all users of a provider"""
+
+    def __init__(self, name: str, limits: ProviderLimits):
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute, limits.requests_per_minute / 60.0)
+        self.tokens = TokenBucket(limits.tokens_per_minute, limits.tokens_per_minute / 60.0)
+        self.paused_until = 0.0
+        self.in_flight = 0
+
+        self._lock = threading.Lock()
+        # asyncio semaphores belong to one event loop, so keep one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limits.max_concurrency)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """Hold a concurrency slot and wait until the request and token budgets allow a call"""
+        async with self._semaphore():
+            wait = max(
+                self.requests.reserve(1),
+                self.tokens.reserve(estimated_tokens),
+                self.paused_until - time.monotonic()
+            )
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            with self._lock:
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token budget once real usage is known"""
+        self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every caller of this provider, e.g. after a 429"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def status(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.limits.max_concurrency,
+            "requests_available": round(self.requests.available, 1),
+            "tokens_available": int(self.tokens.available),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2)
+        }
+
+
+_limiters: Dict[str, ProviderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider_name: str) -> ProviderRateLimiter:
+    """Process-wide limiter for a provider, created on first use"""
+    with _limiters_lock:
+        if provider_name not in _limiters:
+            _limiters[provider_name] = ProviderRateLimiter(provider_name, limits_from_env(provider_name))
+        return _limiters[provider_name]
+
+
+def rate_limiter_status() -> Dict[str, Dict]:
+    """Snapshot of every provider limiter for monitoring"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.status() for name, limiter in limiters.items()}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+    def __init__(self, provider_name: str, retry_in: float):
+        super().__init__(f"{provider_name} circuit open - retry in {retry_in:.0f}s")
+        self.provider_name = provider_name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a provider's recent calls
+
+    While closed, the last `window` outcomes are tracked; once at least
+    `min_calls` are in, the circuit opens if the failure rate reaches
+    `failure_rate_threshold` or the share of calls slower than
+    `slow_call_seconds` reaches `slow_rate_threshold`. With the defaults
+    that is 5 failed requests out of the first 10, or 10 of the last 20.
+    An outcome is one request after its retries, so brief error bursts
+    that retries absorb don't trip it. An open circuit
+    rejects calls for `open_seconds`, then half-opens to let
+    `half_open_probes` trial calls through: success closes it, failure
+    reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 60.0,
+        slow_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.probes_in_flight = 0
+        self._outcomes: Deque[str] = deque(maxlen=window)  # "ok", "slow" or "error"
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        # Caller holds the lock
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+            self.probes_in_flight = 0
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self.probes_in_flight = 0
+        self._outcomes.clear()
+        logging.warning(f"{self.name} circuit opened for {self.open_seconds:.0f}s")
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not reserve a probe)"""
+        with self._lock:
+            self._refresh()
+            return self.state == self.OPEN or (
+                self.state == self.HALF_OPEN and self.probes_in_flight >= self.half_open_probes
+            )
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; half-open calls take a probe slot"""
+        with self._lock:
+            self._refresh()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self.probes_in_flight < self.half_open_probes:
+                self.probes_in_flight += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                logging.info(f"{self.name} circuit closed")
+                return
+            self._outcomes.append("slow" if latency >= self.slow_call_seconds else "ok")
+            self._evaluate()
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append("error")
+            self._evaluate()
+
+    def release(self):
+        """Give back a probe slot when a call ends without an outcome (e.g. cancelled)"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.probes_in_flight > 0:
+                self.probes_in_flight -= 1
+
+    def _evaluate(self):
+        # Caller holds the lock
+        total = len(self._outcomes)
+        if self.state != self.CLOSED or total < self.min_calls:
+            return
+        if (self._outcomes.count("error") / total >= self.failure_rate_threshold
+                or self._outcomes.count("slow") / total >= self.slow_rate_threshold):
+            self._open()
+
+    def status(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            total = len(self._outcomes)
+            return {
+                "state": self.state,
+                "recent_calls": total,
+                "failure_rate": round(self._outcomes.count("error") / total, 2) if total else 0.0,
+                "slow_rate": round(self._outcomes.count("slow") / total, 2) if total else 0.0,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected,
+                "retry_in": round(max(0.0, self.opened_at + self.open_seconds - time.monotonic()), 1)
+                if self.state == self.OPEN else 0.0
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider_name: str) -> CircuitBreaker:
+    """Process-wide circuit breaker for a provider, created on first use
+
+    Thresholds can be tuned with <NAME>_BREAKER_FAILURE_RATE,
+    <NAME>_BREAKER_SLOW_SECONDS and <NAME>_BREAKER_OPEN_SECONDS.
+    """
+    with _breakers_lock:
+        if provider_name not in _breakers:
+            prefix = provider_name.upper()
+            _breakers[provider_name] = CircuitBreaker(
+                provider_name,
+                failure_rate_threshold=float(os.getenv(f"{prefix}_BREAKER_FAILURE_RATE", "0.5")),
+                slow_call_seconds=float(os.getenv(f"{prefix}_BREAKER_SLOW_SECONDS", "60")),
+                open_seconds=float(os.getenv(f"{prefix}_BREAKER_OPEN_SECONDS", "30"))
+            )
+        return _breakers[provider_name]
+
+
+def circuit_breaker_status() -> Dict[str, Dict]:
+    """Snapshot of every provider circuit breaker for monitoring"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.status() for name, breaker in breakers.items()}
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff that honors retry-after"""
+    max_retries: int = 4
+    base_delay: float = 1.0  # seconds
+    max_delay: float = 60.0
+
+    def delay_for(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            # Server told us when to come back; add a little jitter to spread callers
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        # Full jitter: uniform between 0 and the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status carried by an SDK error, if any"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, overloads, server errors and network failures are worth retrying"""
+    status = error_status(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    error_name = type(error).__name__
+    return "Timeout" in error_name or "Connection" in error_name
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Parse retry-after(-ms) headers from an SDK error response"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date form - fall back to exponential backoff
+        logging.debug(f"Unparseable retry-after header from {type(error).__name__}")
+    return None
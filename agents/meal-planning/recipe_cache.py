@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Persistent Recipe Cache
+Content-addressed on-disk cache of AI-generated recipes keyed by RecipeRequirements
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Optional
+
+# Bump when the key layout changes so old entries are never matched
+CACHE_KEY_VERSION = 1
+
+
+def requirements_key(requirements) -> str:
+    """Canonical content hash of a RecipeRequirements instance"""
+    data = asdict(requirements)
+
+    # List fields are sets semantically - order and case must not change the key
+    for list_field in ("dietary_restrictions", "equipment_available"):
+        data[list_field] = sorted({str(item).strip().lower() for item in data.get(list_field) or []})
+
+    canonical = json.dumps(
+        {"version": CACHE_KEY_VERSION, "requirements": data},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RecipeCache:
+    """On-disk recipe cache holding up to N variants per requirements key
+
+    A key only serves hits once it holds `variants_per_key` recipes, so a
+    regenerated plan still sees variety; until then lookups miss and the new
+    recipe is added as another variant. Entries are evicted when older than
+    `max_age_days` or, least recently used first, when the cache grows past
+    `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "data/recipe_cache",
+        variants_per_key: int = 3,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_age_days: int = 90
+    ):
+        self.cache_dir = cache_dir
+        self.variants_per_key = max(1, variants_per_key)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+
+        self._lock = threading.Lock()
+        self._rotation: Dict[str, int] = {}
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Scan the cache directory for entry sizes and last access times"""
+        index = {}
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(".json"):
+                    stat = os.stat(os.path.join(root, filename))
+                    index[filename[:-5]] = {"size": stat.st_size, "last_access": stat.st_mtime}
+        return index
+
+    def _read_entry(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, key: str, entry: Dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write atomically so a crash never leaves a truncated entry behind
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+        self._index[key] = {"size": os.path.getsize(path), "last_access": time.time()}
+
+    def _remove_entry(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        self._index.pop(key, None)
+        self._rotation.pop(key, None)
+        self._stats["evictions"] += 1
+
+    def _fresh_variants(self, entry: Dict) -> list:
+        cutoff = time.time() - self.max_age_seconds
+        return [v for v in entry.get("variants", []) if v.get("stored_at", 0) >= cutoff]
+
+    def get(self, requirements) -> Optional[Dict]:
+        """Return a cached recipe variant, or None when the key still needs variants"""
+        key = requirements_key(requirements)
+
+        with self._lock:
+            entry = self._read_entry(key) if key in self._index else None
+            variants = self._fresh_variants(entry) if entry else []
+
+            if entry and len(variants) < len(entry.get("variants", [])):
+                # Drop expired variants on read
+                if variants:
+                    entry["variants"] = variants
+                    self._write_entry(key, entry)
+                else:
+                    self._remove_entry(key)
+
+            if len(variants) < self.variants_per_key:
+                self._stats["misses"] += 1
+                return None
+
+            # Rotate through variants so consecutive hits differ
+            position = self._rotation.get(key, 0)
+            self._rotation[key] = position + 1
+            recipe = copy.deepcopy(variants[position % len(variants)]["recipe"])
+
+            os.utime(self._path(key))
+            self._index[key]["last_access"] = time.time()
+            self._stats["hits"] += 1
+
+        recipe["cache_hit"] = True
+        return recipe
+
+    def put(self, requirements, recipe: Dict):
+        """Store a generated recipe as another variant for its requirements"""
+        key = requirements_key(requirements)
+
+        with self._lock:
+            entry = (self._read_entry(key) if key in self._index else None) or {
+                "key": key,
+                "requirements": asdict(requirements),
+                "created_at": datetime.now().isoformat(),
+                "variants": []
+            }
+
+            variants = self._fresh_variants(entry)
+            if len(variants) >= self.variants_per_key:
+                return
+
+            # Usage belongs to the run that paid for it, not to later cache hits
+            stored = {k: v for k, v in recipe.items() if k not in ("cache_hit", "usage")}
+            variants.append({"recipe": stored, "stored_at": time.time()})
+            entry["variants"] = variants
+
+            self._write_entry(key, entry)
+            self._stats["writes"] += 1
+            self._evict_to_size()
+
+    def _evict_to_size(self):
+        """Evict least recently used entries until the cache fits in max_bytes"""
+        total = sum(item["size"] for item in self._index.values())
+        if total <= self.max_bytes:
+            return
+
+        # Leave some headroom so we don't evict on every write
+        target = self.max_bytes * 0.9
+        for key, item in sorted(self._index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= target:
+                break
+            total -= item["size"]
+            self._remove_entry(key)
+
+        logging.info(f"Recipe cache evicted down to {int(total)} bytes")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current cache size"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": sum(item["size"] for item in self._index.values())
+            }
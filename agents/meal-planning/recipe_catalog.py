@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Recipe Catalog
+In-memory recipe store behind MealPlanningAgent.recipe_database: hash
+indexes by id, (menu type, category), cuisine and difficulty, plus sorted
+calorie and protein columns for range queries
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from meal_planning_agent import Recipe
+    from recipe_library import RecipeLibrary
+
+# Catalog category for each library meal category
+LIBRARY_CATEGORIES = {"breakfast": "breakfast", "lunch": "lunch", "dinner": "dinner", "snack": "snacks"}
+
+# Menu types whose plans use their own categories
+MENU_TYPE_CATEGORIES = {
+    "intermittent_fasting": {"breakfast": "break_fast", "lunch": "main_meal", "dinner": "main_meal", "snack": "snacks"}
+}
+
+# A (min, max) range; either end may be None for an open range
+Range = Tuple[Optional[float], Optional[float]]
+
+
+class SortedColumn:
+    """Recipe ids ordered by a numeric value, for range queries with bisect"""
+
+    def __init__(self):
+        self._values: List[float] = []
+        self._ids: List[str] = []
+
+    def add(self, value: float, recipe_id: str):
+        index = bisect_right(self._values, value)
+        self._values.insert(index, value)
+        self._ids.insert(index, recipe_id)
+
+    def remove(self, value: float, recipe_id: str):
+        index = bisect_left(self._values, value)
+        while self._ids[index] != recipe_id:
+            index += 1
+        del self._values[index]
+        del self._ids[index]
+
+    def between(self, low: Optional[float] = None, high: Optional[float] = None) -> List[str]:
+        """Ids with low <= value <= high, in ascending value order"""
+        start = 0 if low is None else bisect_left(self._values, low)
+        end = len(self._values) if high is None else bisect_right(self._values, high)
+        return self._ids[start:end]
+
+
+class RecipeCatalog:
+    """Recipes of every menu type, indexed for lookups and filtered selection
+
+    Recipe ids are unique across the catalog. Every query returns recipes in
+    the order they were added, so seeded random choices stay reproducible.
+    """
+
+    def __init__(self):
+        self._recipes: Dict[str, "Recipe"] = {}
+        self._menu_types: Dict[str, str] = {}  # menu type per recipe id
+        self._by_menu_type: Dict[str, List[str]] = {}
+        self._order: Dict[str, int] = {}
+        self._by_slot: Dict[Tuple[str, str], List[str]] = {}
+        self._by_cuisine: Dict[str, List[str]] = {}
+        self._by_difficulty: Dict[str, List[str]] = {}
+        self._calories = SortedColumn()
+        self._protein = SortedColumn()
+        self._added = 0
+
+    @classmethod
+    def from_nested(cls, recipes: Dict[str, Dict[str, List["Recipe"]]]) -> "RecipeCatalog":
+        """Build a catalog from the menu type -> category -> recipes layout"""
+        catalog = cls()
+        for menu_type, categories in recipes.items():
+            for category, category_recipes in categories.items():
+                for recipe in category_recipes:
+                    catalog.add(menu_type, category, recipe)
+        return catalog
+
+    def add(self, menu_type: str, category: str, recipe: "Recipe"):
+        if recipe.id in self._recipes:
+            raise ValueError(f"Duplicate recipe id: {recipe.id}")
+
+        self._recipes[recipe.id] = recipe
+        self._menu_types[recipe.id] = menu_type
+        self._order[recipe.id] = self._added
+        self._added += 1
+
+        self._by_menu_type.setdefault(menu_type, []).append(recipe.id)
+        self._by_slot.setdefault((menu_type, category), []).append(recipe.id)
+        self._by_cuisine.setdefault(recipe.cuisine.lower(), []).append(recipe.id)
+        self._by_difficulty.setdefault(recipe.difficulty, []).append(recipe.id)
+        self._calories.add(recipe.calories, recipe.id)
+        self._protein.add(recipe.protein_g, recipe.id)
+
+    def remove(self, recipe_id: str):
+        recipe = self._recipes.pop(recipe_id)
+        menu_type = self._menu_types.pop(recipe_id)
+        del self._order[recipe_id]
+
+        self._by_menu_type[menu_type].remove(recipe_id)
+
+        for (slot_menu_type, category), ids in list(self._by_slot.items()):
+            if slot_menu_type == menu_type and recipe_id in ids:
+                ids.remove(recipe_id)
+                if not ids:
+                    del self._by_slot[(slot_menu_type, category)]
+        self._by_cuisine[recipe.cuisine.lower()].remove(recipe_id)
+        self._by_difficulty[recipe.difficulty].remove(recipe_id)
+        self._calories.remove(recipe.calories, recipe_id)
+        self._protein.remove(recipe.protein_g, recipe_id)
+
+    def add_library(self, library: "RecipeLibrary", menu_types: List[str] = None) -> int:
+        """Index library recipes under the first menu type their diets match
+
+        Library recipes without a category or a matching diet, and ids
+        already in the catalog, are skipped.
+        Returns the number of catalog entries added.
+        """
+        from meal_planning_agent import Recipe
+
+        added = 0
+        for entry in library.recipes:
+            diets = [diet for diet in entry.diets if menu_types is None or diet in menu_types]
+            if entry.category is None or not diets or entry.library_id in self._recipes:
+                continue
+            category = MENU_TYPE_CATEGORIES.get(diets[0], LIBRARY_CATEGORIES)[entry.category]
+
+            self.add(diets[0], category, Recipe(
+                id=entry.library_id,
+                name=entry.name,
+                category=category,
+                cuisine=entry.cuisine or "International",
+                prep_time=entry.prep_minutes,
+                cook_time=entry.cook_minutes,
+                calories=entry.calories,
+                protein=entry.protein,
+                carbs=entry.carbs,
+                fat=entry.fat,
+                notes=entry.description,
+                difficulty=entry.difficulty,
+                meal_type=entry.category
+            ))
+            added += 1
+        return added
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._recipes
+
+    def __iter__(self) -> Iterator["Recipe"]:
+        return iter(self._recipes.values())
+
+    def get(self, recipe_id: str, menu_type: str = None) -> Optional["Recipe"]:
+        """Recipe by id; with `menu_type`, only if it belongs to that menu type"""
+        if menu_type is not None and self._menu_types.get(recipe_id) != menu_type:
+            return None
+        return self._recipes.get(recipe_id)
+
+    def menu_type_of(self, recipe_id: str) -> Optional[str]:
+        return self._menu_types.get(recipe_id)
+
+    def menu_types(self) -> List[str]:
+        return [menu_type for menu_type, ids in self._by_menu_type.items() if ids]
+
+    def categories(self, menu_type: str) -> List[str]:
+        return [category for slot_menu_type, category in self._by_slot if slot_menu_type == menu_type]
+
+    def by_category(self, menu_type: str, category: str) -> List["Recipe"]:
+        return [self._recipes[recipe_id] for recipe_id in self._by_slot.get((menu_type, category), [])]
+
+    def select(
+        self,
+        menu_type: str = None,
+        category: str = None,
+        cuisine: str = None,
+        difficulty: str = None,
+        calories: Range = None,
+        protein: Range = None
+    ) -> List["Recipe"]:
+        """Recipes matching every given filter (calories/protein as inclusive ranges)"""
+        candidates: List[Set[str]] = []
+
+        if menu_type is not None and category is not None:
+            candidates.append(set(self._by_slot.get((menu_type, category), [])))
+        elif menu_type is not None:
+            candidates.append(set(self._by_menu_type.get(menu_type, [])))
+        elif category is not None:
+            candidates.append({
+                recipe_id
+                for (_, slot_category), ids in self._by_slot.items() if slot_category == category
+                for recipe_id in ids
+            })
+        if cuisine is not None:
+            candidates.append(set(self._by_cuisine.get(cuisine.lower(), [])))
+        if difficulty is not None:
+            candidates.append(set(self._by_difficulty.get(difficulty, [])))
+        if calories is not None:
+            candidates.append(set(self._calories.between(*calories)))
+        if protein is not None:
+            candidates.append(set(self._protein.between(*protein)))
+
+        if not candidates:
+            return list(self._recipes.values())
+
+        # Intersect starting from the most selective index
+        candidates.sort(key=len)
+        matches = candidates[0].intersection(*candidates[1:])
+        return [self._recipes[recipe_id] for recipe_id in sorted(matches, key=self._order.__getitem__)]
+
+    def as_nested(self, menu_type: str = None) -> Dict:
+        """The legacy layout: category -> recipes for one menu type, or menu type -> category -> recipes"""
+        if menu_type is not None:
+            return {category: self.by_category(menu_type, category) for category in self.categories(menu_type)}
+        return {name: self.as_nested(name) for name in self.menu_types()}
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Recipe Library
+Searchable index of previously generated recipes (the RECIPE_DATABASE.txt
+export), so plans reuse a close match before paying for a new AI recipe
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Meal categories a library recipe may fill, by requested meal category
+CATEGORY_MATCHES = {
+    "breakfast": ("breakfast",),
+    "lunch": ("lunch", "dinner"),
+    "dinner": ("dinner", "lunch"),
+    "snack": ("snack",),
+    "break_fast": ("breakfast", "lunch"),
+    "main_meal": ("dinner", "lunch"),
+    "optional_snack": ("snack",)
+}
+
+# First keyword found (name before description) decides a recipe's category
+CATEGORY_KEYWORDS = [
+    ("snack", ("snack", "bites", "energy balls")),
+    ("breakfast", ("breakfast", "brunch")),
+    ("lunch", ("lunch",)),
+    ("dinner", ("dinner", "supper"))
+]
+
+CUISINE_KEYWORDS = {
+    "Greek": ("greek", "feta", "tzatziki", "souvlaki", "spanakopita"),
+    "Italian": ("italian", "tuscan", "risotto", "pasta", "parmesan", "pesto", "caprese"),
+    "Spanish": ("spanish", "paella", "chorizo", "gazpacho"),
+    "Turkish": ("turkish", "shakshuka", "menemen"),
+    "Moroccan": ("moroccan", "tagine", "harissa", "harira"),
+    "Mexican": ("mexican", "taco", "enchilada", "fajita", "salsa", "chipotle"),
+    "Asian": ("asian", "stir-fry", "stir fry", "teriyaki", "ginger", "sesame", "thai", "curry"),
+    "American": ("american", "bbq", "burger", "pumpkin", "pecan", "maple"),
+    "Mediterranean": ("mediterranean",)
+}
+
+# Requested cuisine styles that are served by a broader library cuisine
+CUISINE_ALIASES = {
+    "Asian-inspired": "Asian",
+    "International": None  # any cuisine
+}
+
+DIET_KEYWORDS = {
+    "keto": ("keto",),
+    "paleo": ("paleo",),
+    "mediterranean": ("mediterranean",),
+    "intermittent_fasting": ("fasting", "break your fast", "satiating"),
+    "family_friendly": ("kid", "family")
+}
+
+# Keto plans only take library recipes this low in carbs (grams per serving)
+KETO_MAX_CARBS = 15
+
+_MEAT = (
+    "beef", "steak", "pork", "bacon", "ham", "prosciutto", "sausage", "chorizo", "lamb", "chicken",
+    "turkey", "duck", "veal", "venison", "meatball", "pepperoni", "salami", "meat"
+)
+_SEAFOOD = (
+    "fish", "salmon", "tuna", "cod", "halibut", "trout", "sardine", "anchovy", "mackerel", "tilapia",
+    "shrimp", "prawn", "crab", "lobster", "scallop", "mussel", "clam", "oyster", "seafood", "calamari"
+)
+_DAIRY = (
+    "cheese", "cheesy", "yogurt", "milk", "cream", "butter", "feta", "parmesan", "ricotta",
+    "mozzarella", "halloumi", "ghee", "kefir", "labneh", "tzatziki"
+)
+_EGG = ("egg", "frittata", "omelet", "omelette", "shakshuka", "quiche")
+
+# Words in a recipe's name or description that rule it out for a restriction.
+# The library export has no ingredient lists, so this is a conservative
+# screen; restrictions without an entry never match library recipes.
+RESTRICTION_FORBIDDEN_TERMS: Dict[str, tuple] = {
+    "vegetarian": _MEAT + _SEAFOOD + ("gelatin",),
+    "vegan": _MEAT + _SEAFOOD + _DAIRY + _EGG + ("honey", "gelatin", "whey"),
+    "pescatarian": _MEAT,
+    "gluten-free": (
+        "wheat", "pasta", "bread", "couscous", "flour", "barley", "farro", "bulgur", "tortilla",
+        "noodle", "crouton", "panko", "pita", "orzo", "seitan", "breadcrumb", "toast", "pancake",
+        "muffin", "waffle", "pizza", "spaghetti", "lasagna", "rye"
+    ),
+    "dairy-free": _DAIRY,
+    "nut-free": (
+        "nut", "almond", "walnut", "pecan", "cashew", "pistachio", "hazelnut", "peanut",
+        "macadamia", "praline"
+    ),
+    "egg-free": _EGG,
+    "shellfish-free": ("shrimp", "prawn", "crab", "lobster", "scallop", "mussel", "clam", "oyster"),
+    "pork-free": ("pork", "bacon", "ham", "prosciutto", "sausage", "chorizo", "pepperoni", "salami")
+}
+
+# A preceding word that makes a forbidden term a substitute ("almond milk", "flax egg")
+SUBSTITUTE_QUALIFIERS = {
+    "almond", "coconut", "oat", "soy", "peanut", "cashew", "rice", "cocoa", "sunflower", "seed",
+    "flax", "chia", "vegan", "plant-based", "dairy-free", "non-dairy", "apple", "nut"
+}
+
+_ENTRY_RE = re.compile(r"^\s*\d+\.\s+(?P<name>.+?)\s*$", re.MULTILINE)
+_FIELD_RE = re.compile(r"^\s*(?P<key>ID|Description|Image URL):\s*(?P<value>.*?)\s*$", re.MULTILINE)
+_TIMES_RE = re.compile(
+    r"Prep:\s*(?P<prep>\d+)m\s*\|\s*Cook:\s*(?P<cook>\d+)m\s*\|\s*"
+    r"Servings:\s*(?P<servings>\d+)\s*\|\s*Difficulty:\s*(?P<difficulty>\w+)"
+)
+_NUTRITION_RE = re.compile(
+    r"Nutrition:\s*(?P<calories>\d+)\s*cal,\s*(?P<protein>\d+)g protein,\s*"
+    r"(?P<carbs>\d+)g carbs,\s*(?P<fat>\d+)g fat(?:,\s*(?P<fiber>\d+)g fiber)?"
+)
+_SEPARATOR_RE = re.compile(r"^-{20,}\s*$", re.MULTILINE)
+
+
+def normalize_restriction(restriction: str) -> str:
+    """'Gluten Free' / 'gluten_free' -> 'gluten-free'"""
+    return re.sub(r"[\s_]+", "-", restriction.strip().lower())
+
+
+def mentions(text: str, term: str) -> bool:
+    """Whole-word (optionally plural) match, so "egg" skips "eggplant" but finds "eggs"
+
+    Matches right after a substitute qualifier ("almond milk") don't count.
+    `text` is expected in lower case.
+    """
+    for match in re.finditer(rf"\b{re.escape(term)}(?:s|es)?\b", text):
+        before = text[:match.start()].split()
+        if not before or before[-1].strip("-,(\"") not in SUBSTITUTE_QUALIFIERS:
+            return True
+    return False
+
+
+def conflicting_terms(text: str, restrictions: List[str]) -> List[str]:
+    """Forbidden terms of the known restrictions that `text` mentions"""
+    text = text.lower()
+    return [
+        term
+        for restriction in restrictions
+        for term in RESTRICTION_FORBIDDEN_TERMS.get(normalize_restriction(restriction), ())
+        if mentions(text, term)
+    ]
+
+
+@dataclass
+class LibraryRecipe:
+    """One recipe from the library export, with inferred category, cuisine and diets"""
+    library_id: str
+    name: str
+    description: str
+    prep_minutes: int
+    cook_minutes: int
+    servings: int
+    difficulty: str
+    calories: int
+    protein: int
+    carbs: int
+    fat: int
+    fiber: int = 0
+    image_url: str = ""
+    category: Optional[str] = None
+    cuisine: Optional[str] = None
+    diets: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return f"{self.name} {self.description}".lower()
+
+    def allows(self, restrictions: List[str]) -> bool:
+        """True when nothing in the name or description conflicts with the restrictions"""
+        text = self.text
+        for restriction in restrictions:
+            forbidden = RESTRICTION_FORBIDDEN_TERMS.get(normalize_restriction(restriction))
+            if forbidden is None or any(mentions(text, term) for term in forbidden):
+                return False
+        return True
+
+    def to_recipe(self) -> Dict:
+        """Recipe dict in the generator's format; the export carries no ingredients or steps"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "prep_time": f"{self.prep_minutes} minutes",
+            "cook_time": f"{self.cook_minutes} minutes",
+            "servings": self.servings,
+            "calories_per_serving": self.calories,
+            "protein_per_serving": f"{self.protein}g",
+            "carbs_per_serving": f"{self.carbs}g",
+            "fat_per_serving": f"{self.fat}g",
+            "difficulty": self.difficulty,
+            "tags": list(self.diets),
+            "library_id": self.library_id,
+            "image_url": self.image_url
+        }
+
+
+def _infer_category(name: str, description: str) -> Optional[str]:
+    for text in (name.lower(), description.lower()):
+        for category, keywords in CATEGORY_KEYWORDS:
+            if any(keyword in text for keyword in keywords):
+                return category
+    return None
+
+
+def _infer_cuisine(text: str) -> Optional[str]:
+    for cuisine, keywords in CUISINE_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return cuisine
+    return None
+
+
+def parse_recipe_database(text: str) -> List[LibraryRecipe]:
+    """Parse a RECIPE_DATABASE.txt export; entries missing times or nutrition are skipped"""
+    recipes = []
+    for block in _SEPARATOR_RE.split(text):
+        entry = _ENTRY_RE.search(block)
+        times = _TIMES_RE.search(block)
+        nutrition = _NUTRITION_RE.search(block)
+        if not (entry and times and nutrition):
+            continue
+
+        fields = {match.group("key"): match.group("value") for match in _FIELD_RE.finditer(block)}
+        name = entry.group("name")
+        description = fields.get("Description", "")
+        lowered = f"{name} {description}".lower()
+
+        recipes.append(LibraryRecipe(
+            library_id=fields.get("ID", name),
+            name=name,
+            description=description,
+            prep_minutes=int(times.group("prep")),
+            cook_minutes=int(times.group("cook")),
+            servings=int(times.group("servings")),
+            difficulty=times.group("difficulty").lower(),
+            calories=int(nutrition.group("calories")),
+            protein=int(nutrition.group("protein")),
+            carbs=int(nutrition.group("carbs")),
+            fat=int(nutrition.group("fat")),
+            fiber=int(nutrition.group("fiber") or 0),
+            image_url=fields.get("Image URL", ""),
+            category=_infer_category(name, description),
+            cuisine=_infer_cuisine(lowered),
+            diets=[diet for diet, keywords in DIET_KEYWORDS.items() if any(k in lowered for k in keywords)]
+        ))
+    return recipes
+
+
+class RecipeLibrary:
+    """Finds library recipes within tolerance of a RecipeRequirements
+
+    The export has no ingredients or instructions; once generated for a
+    recipe they are saved via `add_details` to `details_path` (JSON), so
+    each library recipe needs filling in at most once.
+
+    Hard limits: a compatible meal category, calories within
+    `calorie_tolerance` (fraction of the target, at least `min_calorie_window`
+    kcal), protein no more than `protein_tolerance` g under target, prep time
+    at most `prep_tolerance` minutes over the limit, difficulty no harder than
+    requested, and no conflict with any dietary restriction. Among matches,
+    the closest in cuisine and diet wins, then the least used, then the
+    closest in calories, so repeated requests spread across equally good
+    matches without settling for an off-cuisine recipe.
+    """
+
+    def __init__(
+        self,
+        recipes: List[LibraryRecipe],
+        details_path: str = None,
+        calorie_tolerance: float = 0.15,
+        min_calorie_window: int = 40,
+        protein_tolerance: int = 5,
+        prep_tolerance: int = 5
+    ):
+        self.recipes = recipes
+        self.calorie_tolerance = calorie_tolerance
+        self.min_calorie_window = min_calorie_window
+        self.protein_tolerance = protein_tolerance
+        self.prep_tolerance = prep_tolerance
+
+        self._by_category: Dict[Optional[str], List[LibraryRecipe]] = {}
+        for recipe in recipes:
+            self._by_category.setdefault(recipe.category, []).append(recipe)
+
+        self._lock = threading.Lock()
+        self._uses: Dict[str, int] = {}
+        self._stats = {"lookups": 0, "hits": 0}
+
+        self.details_path = details_path
+        self.details: Dict[str, Dict] = {}
+        if details_path and os.path.exists(details_path):
+            with open(details_path, "r", encoding="utf-8") as f:
+                self.details = json.load(f)
+
+    @classmethod
+    def from_file(cls, path: str, details_path: str = None, **tolerances) -> "RecipeLibrary":
+        """Load an export
+
+        Generated details go to `details_path`, by default
+        `<name>_details.json` in RECIPE_CACHE_DIR; without either they are
+        kept in memory only, so nothing is written next to the export.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            recipes = parse_recipe_database(f.read())
+        logging.info(f"Loaded {len(recipes)} library recipes from {path}")
+
+        cache_dir = os.getenv("RECIPE_CACHE_DIR")
+        if details_path is None and cache_dir:
+            name = os.path.splitext(os.path.basename(path))[0]
+            details_path = os.path.join(cache_dir, f"{name}_details.json")
+        return cls(recipes, details_path, **tolerances)
+
+    def recipe_dict(self, recipe: LibraryRecipe) -> Dict:
+        """to_recipe() plus any ingredients and instructions saved for it"""
+        data = recipe.to_recipe()
+        data.update(self.details.get(recipe.library_id, {}))
+        return data
+
+    def add_details(self, library_id: str, ingredients: List[Dict], instructions: List[str]):
+        """Save generated ingredients and instructions for a library recipe"""
+        with self._lock:
+            self.details[library_id] = {"ingredients": ingredients, "instructions": instructions}
+            if not self.details_path:
+                return
+
+            directory = os.path.dirname(self.details_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write atomically so a crash never leaves a truncated file behind
+            tmp_path = f"{self.details_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.details, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.details_path)
+
+    def _within_tolerance(self, recipe: LibraryRecipe, req) -> bool:
+        window = max(self.min_calorie_window, req.target_calories * self.calorie_tolerance)
+        if abs(recipe.calories - req.target_calories) > window:
+            return False
+        if recipe.protein < req.target_protein - self.protein_tolerance:
+            return False
+        if recipe.prep_minutes > req.prep_time_max + self.prep_tolerance:
+            return False
+        if req.difficulty_level == "easy" and recipe.difficulty != "easy":
+            return False
+        if req.menu_type == "keto" and recipe.carbs > KETO_MAX_CARBS:
+            return False
+        return recipe.allows(req.dietary_restrictions or [])
+
+    def _mismatch(self, recipe: LibraryRecipe, req) -> float:
+        """Lower is closer: penalties for cuisine and diet mismatches (0 for a full match)"""
+        penalty = 0.0
+        wanted_cuisine = CUISINE_ALIASES.get(req.cuisine_style, req.cuisine_style)
+        if wanted_cuisine and recipe.cuisine != wanted_cuisine:
+            penalty += 0.5
+        if req.menu_type not in recipe.diets:
+            penalty += 0.25
+        return penalty
+
+    def find(self, req) -> Optional[LibraryRecipe]:
+        """Best library recipe for the requirements, or None when none is within tolerance"""
+        candidates = [
+            recipe
+            for category in CATEGORY_MATCHES.get(req.meal_category, (req.meal_category,))
+            for recipe in self._by_category.get(category, [])
+            if self._within_tolerance(recipe, req)
+        ]
+
+        with self._lock:
+            self._stats["lookups"] += 1
+            if not candidates:
+                return None
+
+            best = min(candidates, key=lambda recipe: (
+                self._mismatch(recipe, req),
+                self._uses.get(recipe.library_id, 0),
+                abs(recipe.calories - req.target_calories)
+            ))
+            self._uses[best.library_id] = self._uses.get(best.library_id, 0) + 1
+            self._stats["hits"] += 1
+        return best
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["lookups"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "recipes": len(self.recipes),
+                "recipes_with_details": len(self.details),
+                "distinct_recipes_used": len(self._uses)
+            }
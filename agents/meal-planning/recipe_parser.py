@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Recipe Response Parser
+Tolerant JSON extraction, repair and validation for LLM recipe output
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from recipe_library import conflicting_terms
+
+# Fields every AI recipe needs before it can become a Recipe in a DayMenu
+REQUIRED_FIELDS = [
+    "name", "prep_time", "cook_time", "calories_per_serving",
+    "protein_per_serving", "ingredients", "instructions"
+]
+# Filled with defaults downstream when absent, so never worth a re-request
+OPTIONAL_FIELDS = [
+    "description", "servings", "carbs_per_serving", "fat_per_serving", "tips", "tags"
+]
+
+# Complete values only: a number must be followed by its delimiter, a string by its closing quote
+_STREAM_CALORIES_RE = re.compile(r'"calories_per_serving"\s*:\s*"?(-?\d+(?:\.\d+)?)\s*[^\d.\s]')
+_STREAM_ITEM_RE = re.compile(r'"(?:item|name|ingredient)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+# How many earlier cut points to try when recovering a truncated object
+MAX_RECOVERY_ATTEMPTS = 50
+
+
+class RecipeParseError(ValueError):
+    """Raised when no JSON value can be recovered from a response"""
+
+
+class RecipeRejected(ValueError):
+    """Raised while streaming once a partial recipe already breaks its requirements"""
+
+
+def strip_fences(text: str) -> str:
+    """Drop markdown code fences (closed or not) around a JSON payload"""
+    match = _FENCE_RE.search(text)
+    return match.group(1) if match else text
+
+
+def _scan(text: str):
+    """Walk JSON text outside strings; return open closers, string state and comma cut points"""
+    stack: List[str] = []
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = escaped = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                # Complete top-level value; anything after it is prose
+                return [], False, False, cuts, index + 1
+        elif char == ",":
+            cuts.append((index, tuple(stack)))
+
+    return stack, in_string, escaped, cuts, len(text)
+
+
+def extract_json(text: str) -> str:
+    """The first JSON object/array in `text`, cut at its end (or left open if truncated)"""
+    text = strip_fences(text)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise RecipeParseError("Response contains no JSON object")
+
+    text = text[min(starts):]
+    _, _, _, _, end = _scan(text)
+    return text[:end]
+
+
+def remove_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket, leaving string contents alone"""
+    result = []
+    in_string = escaped = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            rest = text[index + 1:].lstrip()
+            if not rest or rest[0] in "}]":
+                continue
+        result.append(char)
+
+    return "".join(result)
+
+
+def _close_candidates(text: str):
+    """Ways to close a truncated JSON value, most complete first"""
+    stack, in_string, escaped, cuts, _ = _scan(text)
+    if not stack and not in_string:
+        yield text
+        return
+
+    # Finish the value in progress: close the string, then every open bracket
+    tail = text[:-1] if escaped else text
+    yield remove_trailing_commas(tail + ('"' if in_string else "") + "".join(reversed(stack)))
+
+    # Otherwise drop the incomplete member back to the last complete one
+    for index, open_stack in reversed(cuts[-MAX_RECOVERY_ATTEMPTS:]):
+        yield remove_trailing_commas(text[:index] + "".join(reversed(open_stack)))
+
+
+def parse_json_tolerant(text: str) -> Any:
+    """Parse LLM JSON output, repairing fences, prose, trailing commas and truncation"""
+    if not text or not text.strip():
+        raise RecipeParseError("Empty response")
+
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+
+    candidate = remove_trailing_commas(extract_json(text))
+    for attempt in _close_candidates(candidate):
+        try:
+            return json.loads(attempt, strict=False)
+        except ValueError:
+            continue
+
+    raise RecipeParseError("Could not repair JSON response")
+
+
+def _coerce_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        match = _NUMBER_RE.search(value.replace(",", ""))
+        if match:
+            number = float(match.group())
+            return int(number) if number.is_integer() else number
+    return None
+
+
+def _coerce_grams(value):
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    number = _coerce_number(value)
+    return f"{number}g" if number is not None else None
+
+
+def _coerce_minutes(value):
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    number = _coerce_number(value)
+    return f"{number} minutes" if number is not None else None
+
+
+def _coerce_servings(value):
+    number = _coerce_number(value)
+    return int(number) if number else None
+
+
+def _coerce_ingredients(value):
+    if not isinstance(value, list):
+        return None
+
+    ingredients = []
+    for item in value:
+        if isinstance(item, str) and item.strip():
+            ingredients.append({"item": item.strip(), "amount": "", "unit": ""})
+        elif isinstance(item, dict):
+            name = item.get("item") or item.get("name") or item.get("ingredient")
+            if not isinstance(name, str) or not name.strip():
+                continue
+            ingredients.append({
+                "item": name.strip(),
+                "amount": str(item.get("amount", "") or ""),
+                "unit": str(item.get("unit", "") or "")
+            })
+    return ingredients or None
+
+
+def _coerce_instructions(value):
+    if isinstance(value, str):
+        value = value.splitlines()
+    if not isinstance(value, list):
+        return None
+
+    steps = []
+    for step in value:
+        if isinstance(step, dict):
+            step = step.get("text") or step.get("instruction") or step.get("step")
+        if isinstance(step, (int, float)):
+            step = str(step)
+        if isinstance(step, str) and step.strip():
+            steps.append(step.strip())
+    return steps or None
+
+
+_COERCERS = {
+    "name": lambda value: value.strip() if isinstance(value, str) and value.strip() else None,
+    "prep_time": _coerce_minutes,
+    "cook_time": _coerce_minutes,
+    "calories_per_serving": _coerce_number,
+    "protein_per_serving": _coerce_grams,
+    "carbs_per_serving": _coerce_grams,
+    "fat_per_serving": _coerce_grams,
+    "servings": _coerce_servings,
+    "ingredients": _coerce_ingredients,
+    "instructions": _coerce_instructions
+}
+
+
+def normalize_recipe(data: Any) -> Tuple[Dict, List[str]]:
+    """Coerce a parsed recipe to the expected types
+
+    Returns the cleaned recipe and the required fields that are missing or
+    unusable. Unknown fields are kept as-is; invalid known fields are dropped.
+    """
+    if not isinstance(data, dict):
+        return {}, list(REQUIRED_FIELDS)
+
+    recipe = {}
+    for key, value in data.items():
+        coerce = _COERCERS.get(key)
+        if coerce is None:
+            recipe[key] = value
+            continue
+        coerced = coerce(value)
+        if coerced is not None:
+            recipe[key] = coerced
+
+    missing = [field for field in REQUIRED_FIELDS if field not in recipe]
+    return recipe, missing
+
+
+def parse_recipe_response(text: str) -> Tuple[Dict, List[str]]:
+    """Parse and validate a single-recipe response; see normalize_recipe"""
+    data = parse_json_tolerant(text)
+    if isinstance(data, dict) and isinstance(data.get("recipe"), dict):
+        data = data["recipe"]
+    return normalize_recipe(data)
+
+
+def is_salvageable(missing: List[str]) -> bool:
+    """Worth re-requesting the gaps rather than the whole recipe"""
+    return "name" not in missing and len(missing) <= len(REQUIRED_FIELDS) // 2
+
+
+class StreamingRecipeCheck:
+    """Incremental validator for a streamed single-recipe response
+
+    Called with the text received so far; raises RecipeRejected as soon as
+    the calories are more than `calorie_margin` from the target, or an
+    ingredient conflicts with a dietary restriction. Only complete values
+    are judged, and each is checked once.
+    """
+
+    def __init__(self, requirements, calorie_margin: int = 100):
+        self.requirements = requirements
+        self.calorie_margin = calorie_margin
+        self._calories_checked = False
+        self._items_checked = 0
+
+    def __call__(self, text: str):
+        req = self.requirements
+
+        if not self._calories_checked:
+            match = _STREAM_CALORIES_RE.search(text)
+            if match:
+                self._calories_checked = True
+                calories = float(match.group(1))
+                if abs(calories - req.target_calories) > self.calorie_margin:
+                    raise RecipeRejected(
+                        f"{calories:.0f} calories is far from the {req.target_calories} calorie target"
+                    )
+
+        if req.dietary_restrictions:
+            items = _STREAM_ITEM_RE.findall(text)
+            for item in items[self._items_checked:]:
+                conflicts = conflicting_terms(item, req.dietary_restrictions)
+                if conflicts:
+                    raise RecipeRejected(
+                        f"'{item}' conflicts with {', '.join(req.dietary_restrictions)}"
+                    )
+            self._items_checked = len(items)
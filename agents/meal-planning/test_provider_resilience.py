@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Circuit breaker behaviour under rate limiting and outages"""
+
+import asyncio
+
+import pytest
+
+import provider_resilience
+from ai_providers import FakeProvider, FakeProviderError, ProviderRequest
+from provider_resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, get_circuit_breaker
+
+
+@pytest.fixture(autouse=True)
+def fresh_providers(monkeypatch):
+    """Process-wide limiters and breakers start clean, with budgets that never throttle"""
+    monkeypatch.setenv("FAKE_RPM", "100000")
+    monkeypatch.setenv("FAKE_TPM", "100000000")
+    monkeypatch.setenv("FAKE_MAX_CONCURRENCY", "64")
+    provider_resilience._limiters.clear()
+    provider_resilience._breakers.clear()
+    yield
+    provider_resilience._limiters.clear()
+    provider_resilience._breakers.clear()
+
+
+def fake_provider(**kwargs) -> FakeProvider:
+    provider = FakeProvider(latency_median=0.001, latency_distribution="fixed", **kwargs)
+    provider.retry_policy = RetryPolicy(base_delay=0.001, max_delay=0.005)
+    return provider
+
+
+async def complete_all(provider: FakeProvider, count: int) -> list:
+    requests = [ProviderRequest(prompt=f"recipe {index}", model="fake-model") for index in range(count)]
+    return await asyncio.gather(*(provider.complete(request) for request in requests), return_exceptions=True)
+
+
+def test_rate_limits_do_not_open_the_breaker():
+    results = asyncio.run(complete_all(fake_provider(rate_limit_rate=0.3), 100))
+
+    breaker = get_circuit_breaker("fake")
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.times_opened == 0
+    assert not any(isinstance(result, CircuitOpenError) for result in results)
+
+
+def test_retried_server_errors_count_once_per_request():
+    provider = fake_provider(error_rate=0.3)
+    results = asyncio.run(complete_all(provider, 100))
+
+    # Retries absorb a 30% error rate, so nearly every request succeeds
+    assert sum(isinstance(result, Exception) for result in results) <= 2
+    assert get_circuit_breaker("fake").times_opened == 0
+    assert provider.calls > 100
+
+
+def test_persistent_outage_opens_the_breaker():
+    provider = fake_provider(error_rate=1.0)
+    provider.retry_policy = RetryPolicy(max_retries=0)
+
+    async def one_by_one():
+        results = []
+        for index in range(20):
+            try:
+                results.append(await provider.complete(ProviderRequest(prompt=f"recipe {index}", model="fake-model")))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    results = asyncio.run(one_by_one())
+
+    breaker = get_circuit_breaker("fake")
+    assert breaker.times_opened == 1
+    assert sum(isinstance(result, FakeProviderError) for result in results) == breaker.min_calls
+    assert sum(isinstance(result, CircuitOpenError) for result in results) == 20 - breaker.min_calls
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Recipes generated concurrently keep distinct ids through to the plan"""
+
+import asyncio
+
+import pytest
+
+import provider_resilience
+from ai_menu_generator import AIMenuGenerator
+from ai_providers import FakeProvider
+from enhanced_agent import EnhancedMealPlanningAgent
+
+
+@pytest.fixture(autouse=True)
+def fresh_providers(monkeypatch):
+    """Process-wide limiters and breakers start clean, with budgets that never throttle"""
+    monkeypatch.setenv("CLAUDE_RPM", "100000")
+    monkeypatch.setenv("CLAUDE_TPM", "100000000")
+    monkeypatch.setenv("CLAUDE_MAX_CONCURRENCY", "64")
+    provider_resilience._limiters.clear()
+    provider_resilience._breakers.clear()
+    yield
+    provider_resilience._limiters.clear()
+    provider_resilience._breakers.clear()
+
+
+def fake_provider() -> FakeProvider:
+    return FakeProvider(name="claude", latency_distribution="fixed", latency_median=0.02)
+
+
+def test_concurrent_month_has_unique_recipe_ids():
+    agent = EnhancedMealPlanningAgent(providers={"claude": fake_provider()}, max_concurrency=8)
+    plan = asyncio.run(agent.generate_ai_monthly_plan("mediterranean", 2, 2025))
+
+    meals = [
+        meal
+        for day in plan["daily_menus"].values()
+        for slot in ("breakfast", "morning_snack", "lunch", "afternoon_snack", "dinner")
+        for meal in [day.get(slot)] if meal
+    ]
+    ids = [meal["id"] for meal in meals]
+    assert len(ids) == 112
+    assert len(set(ids)) == len(ids)
+    assert len(plan["recipe_collection"]) == len(ids)
+
+
+def test_generator_month_has_unique_recipe_ids():
+    generator = AIMenuGenerator(providers={"claude": fake_provider()})
+    menu = asyncio.run(generator.generate_monthly_menu("mediterranean", 2, 2025, batch_mode="day"))
+
+    ids = [
+        recipe["id"]
+        for week in menu["weeks"].values()
+        for day in week["days"].values()
+        for recipe in day["meals"].values()
+    ]
+    assert len(set(ids)) == len(ids)
+    assert menu["summary"]["total_unique_recipes"] == len(ids)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Usage Accounting
+Token, latency and cost totals for AI calls: per recipe through a metering
+context, and process-wide per model and per menu type / meal category
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from prompt_builder import CACHE_READ_COST_FACTOR
+
+# USD per million (input, output) tokens
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-sonnet-20240229": (3.00, 15.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo-preview": (10.00, 30.00)
+}
+
+# Share of the input price billed for cached prompt tokens, by provider
+CACHED_INPUT_FACTORS = {"claude": CACHE_READ_COST_FACTOR, "openai": 0.5}
+
+# OpenAI counts cached tokens inside prompt_tokens; Anthropic reports them separately
+CACHED_INCLUDED_IN_INPUT = {"openai"}
+
+# Batch jobs bill at half the interactive price
+BATCH_PRICE_FACTOR = 0.5
+
+
+def estimate_cost(response, batch: bool = False) -> float:
+    """USD cost of one ProviderResponse (0 for models without a known price)"""
+    input_price, output_price = MODEL_PRICES.get(response.model, (0.0, 0.0))
+    cached = response.cached_input_tokens
+    uncached = response.input_tokens - cached if response.provider in CACHED_INCLUDED_IN_INPUT else response.input_tokens
+    cached_factor = CACHED_INPUT_FACTORS.get(response.provider, 1.0)
+
+    cost = (
+        max(uncached, 0) * input_price
+        + cached * input_price * cached_factor
+        + response.output_tokens * output_price
+    ) / 1_000_000
+    return cost * BATCH_PRICE_FACTOR if batch else cost
+
+
+class Usage:
+    """Running totals for a set of AI calls"""
+
+    FIELDS = ("calls", "input_tokens", "output_tokens", "cached_input_tokens", "latency_seconds", "cost_usd")
+
+    def __init__(self, **totals):
+        for name in self.FIELDS:
+            setattr(self, name, totals.get(name, 0))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "Usage":
+        return cls(**(data or {}))
+
+    def add_response(self, response, batch: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += response.input_tokens
+            self.output_tokens += response.output_tokens
+            self.cached_input_tokens += response.cached_input_tokens
+            self.latency_seconds += response.latency
+            self.cost_usd += estimate_cost(response, batch)
+
+    def merge(self, other: "Usage"):
+        with self._lock:
+            for name in self.FIELDS:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def share(self, parts: int) -> "Usage":
+        """An even 1/parts share, for calls that served several recipes"""
+        parts = max(parts, 1)
+        return Usage(**{name: getattr(self, name) / parts for name in self.FIELDS})
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": round(self.calls, 2),
+                "input_tokens": round(self.input_tokens),
+                "output_tokens": round(self.output_tokens),
+                "cached_input_tokens": round(self.cached_input_tokens),
+                "latency_seconds": round(self.latency_seconds, 2),
+                "cost_usd": round(self.cost_usd, 6)
+            }
+
+
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("current_usage", default=None)
+
+
+@contextmanager
+def metered() -> Iterator[Usage]:
+    """Collect every call made in this context (and tasks started from it) into a Usage"""
+    usage = Usage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+_by_model: Dict[str, Usage] = {}
+_by_meal: Dict[str, Usage] = {}
+_usage_lock = threading.Lock()
+
+
+def _totals(registry: Dict[str, Usage], key: str) -> Usage:
+    with _usage_lock:
+        if key not in registry:
+            registry[key] = Usage()
+        return registry[key]
+
+
+def record_usage(response, batch: bool = False):
+    """Count a completed call process-wide and in the current metering context"""
+    _totals(_by_model, f"{response.provider}/{response.model}").add_response(response, batch)
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add_response(response, batch)
+
+
+def record_meal_usage(menu_type: str, meal_category: str, usage: Usage):
+    """Attribute one recipe's usage to its menu type and meal category process-wide"""
+    _totals(_by_meal, f"{menu_type}/{meal_category}").merge(usage)
+
+
+def usage_snapshot() -> Dict[str, Dict]:
+    """Process-wide usage by provider model and by menu type / meal category"""
+    with _usage_lock:
+        by_model = dict(_by_model)
+        by_meal = dict(_by_meal)
+    return {
+        "by_model": {key: usage.as_dict() for key, usage in sorted(by_model.items())},
+        "by_meal": {key: usage.as_dict() for key, usage in sorted(by_meal.items())}
+    }
+
+
+def usage_report(entries: Iterable[Tuple[str, str, str, Optional[Dict]]]) -> Dict:
+    """Plan usage from (week, day, meal_category, recipe usage) entries
+
+    Returns the plan total plus totals by week, by day and by meal category.
+    """
+    total = Usage()
+    by_week: Dict[str, Usage] = {}
+    by_day: Dict[str, Usage] = {}
+    by_meal: Dict[str, Usage] = {}
+
+    for week, day, meal_category, data in entries:
+        usage = Usage.from_dict(data)
+        total.merge(usage)
+        for registry, key in ((by_week, week), (by_day, day), (by_meal, meal_category)):
+            registry.setdefault(key, Usage()).merge(usage)
+
+    return {
+        "total": total.as_dict(),
+        "by_week": {key: usage.as_dict() for key, usage in by_week.items()},
+        "by_day": {key: usage.as_dict() for key, usage in by_day.items()},
+        "by_meal_category": {key: usage.as_dict() for key, usage in by_meal.items()}
+    }